@@ -0,0 +1,401 @@
+"""Read-only HTTP query API over the dashboard's processed dataset.
+
+Serves the same DataService the Streamlit app reads, so both always show
+the same data version:
+
+    GET /v1/version                                     current data version
+    GET /v1/timeseries?country=A&country=B&start=&end=&metric=   daily metrics
+    GET /v1/latest?country=&date=                       one row per country
+    GET /v1/risk?country=&date=                         incidence ranking
+
+Every data endpoint answers JSON, or an Arrow IPC stream with
+?format=arrow or an Accept header of ARROW_MIME. A response's ETag is the
+data version it was built from, so clients revalidate with If-None-Match
+and get a bodiless 304 until the next refresh. Built responses are kept in
+a size-bounded LRU keyed by version, endpoint and normalised query.
+
+    python api.py --port 8502
+    python api.py --load-test --rate 300 --duration 10
+"""
+import argparse
+import http.client
+import io
+import itertools
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+from cube import METRICS
+from render_cache import RenderCache
+
+logger = logging.getLogger(__name__)
+
+API_HOST = os.environ.get("COVID_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("COVID_API_PORT", 8502))
+API_CACHE_BYTES = int(os.environ.get("COVID_API_CACHE_MB", 32)) * 1024 * 1024
+JSON_MIME = 'application/json'
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+
+
+class QueryError(Exception):
+    """A request that cannot be answered; status is the HTTP status to send"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _dates(params):
+    """(start, end) timestamps from the start/end (or date) parameters.
+
+    The cube's dates are naive UTC days, so a date with an offset is
+    converted to UTC and the zone dropped.
+    """
+    def parse(name):
+        values = params.get(name)
+        if not values:
+            return None
+        try:
+            ts = pd.Timestamp(values[-1])
+        except ValueError:
+            ts = pd.NaT
+        if ts is pd.NaT:
+            raise QueryError(400, f"{name} is not a date: {values[-1]}")
+        return ts.tz_convert(None) if ts.tzinfo is not None else ts
+
+    if 'date' in params:
+        return None, parse('date')
+    return parse('start'), parse('end')
+
+
+def _countries(params, data, required=False):
+    countries = params.get('country', [])
+    if required and not countries:
+        raise QueryError(400, "at least one country parameter is required")
+    unknown = [country for country in countries if country not in data]
+    if unknown:
+        raise QueryError(404, f"unknown countries: {', '.join(unknown)}")
+    return countries
+
+
+def _arrow(frame):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _frame_body(version, frame, fmt, **fields):
+    """frame as an Arrow stream, or as JSON records under 'rows' next to fields"""
+    if fmt == 'arrow':
+        return _arrow(frame)
+    rows = frame.to_json(orient='records', date_format='iso', double_precision=4)
+    header = json.dumps({'version': version.number, **fields})
+    return f'{header[:-1]}, "rows": {rows}}}'.encode('utf-8')
+
+
+class QueryAPI:
+    """Resolves GET requests against the service's current DataVersion.
+
+    Independent of the HTTP server, so it can be called directly; handle()
+    returns (status, headers, body).
+    """
+
+    def __init__(self, service, cache=None):
+        self.service = service
+        self.cache = cache if cache is not None else RenderCache(API_CACHE_BYTES)
+        self.routes = {
+            '/v1/version': self._version,
+            '/v1/timeseries': self._timeseries,
+            '/v1/latest': self._latest,
+            '/v1/risk': self._risk
+        }
+
+    def handle(self, target, headers=None):
+        headers = headers or {}
+        url = urlsplit(target)
+        route = self.routes.get(url.path.rstrip('/') or '/')
+        if route is None:
+            return self._error(404, f"no such endpoint: {url.path}")
+        version = self.service.current
+        if version is None:
+            return self._error(503, "no data loaded yet")
+
+        params = parse_qs(url.query)
+        fmt = params.pop('format', [None])[-1]
+        if fmt is None:
+            fmt = 'arrow' if ARROW_MIME in headers.get('Accept', '') else 'json'
+        if fmt not in ('json', 'arrow'):
+            return self._error(400, f"unknown format: {fmt}")
+
+        etag = f'"{version.key[:32]}-{fmt}"'
+        response_headers = {
+            'ETag': etag,
+            'Cache-Control': 'no-cache',
+            'Content-Type': ARROW_MIME if fmt == 'arrow' else JSON_MIME
+        }
+        if_none_match = headers.get('If-None-Match', '')
+        if etag in if_none_match or if_none_match.strip() == '*':
+            return 304, response_headers, b''
+
+        key = (version.key, url.path, fmt, tuple(sorted((name, tuple(values)) for name, values in params.items())))
+        try:
+            body = self.cache.get_or_render(key, lambda: route(version, params, fmt))
+        except QueryError as e:
+            return self._error(e.status, str(e))
+        return 200, response_headers, body
+
+    def _error(self, status, message):
+        return status, {'Content-Type': JSON_MIME}, json.dumps({'error': message}).encode('utf-8')
+
+    def _version(self, version, params, fmt):
+        cube = version.cube
+        info = {
+            'version': version.number,
+            'key': version.key,
+            'published_at': version.published_at.isoformat(),
+            'countries': len(cube.countries),
+            'first_date': cube.dates[0].strftime('%Y-%m-%d'),
+            'last_date': cube.dates[-1].strftime('%Y-%m-%d')
+        }
+        if fmt == 'arrow':
+            return _arrow(pd.DataFrame([info]))
+        return json.dumps(info).encode('utf-8')
+
+    def _timeseries(self, version, params, fmt):
+        countries = _countries(params, version.cube, required=True)
+        metrics = params.get('metric') or list(METRICS)
+        unknown = [metric for metric in metrics if metric not in METRICS]
+        if unknown:
+            raise QueryError(400, f"unknown metrics: {', '.join(unknown)}")
+        data = version.cube.select(countries).between(*_dates(params))
+
+        if fmt == 'arrow':
+            return _arrow(data.to_frame()[['Country/Region', 'Date', *metrics]])
+        # Rates are float32; widen before rounding so the JSON has no float32 noise
+        planes = {
+            metric: data[metric].astype('float64').round(4) if data[metric].dtype.kind == 'f' else data[metric]
+            for metric in metrics
+        }
+        series = {
+            country: {metric: planes[metric][row].tolist() for metric in metrics}
+            for row, country in enumerate(data.countries)
+        }
+        body = {'version': version.number, 'dates': data.dates.strftime('%Y-%m-%d').tolist(), 'series': series}
+        return json.dumps(body).encode('utf-8')
+
+    def _latest(self, version, params, fmt):
+        countries = _countries(params, version.cube)
+        data = version.cube.select(countries) if countries else version.cube
+        data = data.between(None, _dates(params)[1])
+        date = data.dates[-1].strftime('%Y-%m-%d') if len(data.dates) else None
+        return _frame_body(version, data.latest(), fmt, date=date)
+
+    def _risk(self, version, params, fmt):
+        countries = _countries(params, version.risk)
+        risk = version.risk.select(countries) if countries else version.risk
+        risk = risk.between(None, _dates(params)[1])
+        date = risk.dates[-1].strftime('%Y-%m-%d') if len(risk.dates) else None
+        return _frame_body(version, risk.ranking().drop(columns='Tier'), fmt, date=date)
+
+
+class QueryServer:
+    """Threaded HTTP server for a QueryAPI, with keep-alive connections"""
+
+    def __init__(self, api, host=API_HOST, port=API_PORT):
+        self.api = api
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        api = self.api
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this, keep-alive
+            # responses wait on the client's delayed ACK (~40 ms each)
+            disable_nagle_algorithm = True
+
+            def do_GET(self, send_body=True):
+                try:
+                    status, headers, body = api.handle(self.path, self.headers)
+                except Exception:
+                    logger.exception("Query API request failed: %s", self.path)
+                    status, headers, body = api._error(500, "internal error")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.do_GET(send_body=False)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="covid-query-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def default_paths(version, n_countries=5):
+    """A mix of requests over the busiest countries for load_test"""
+    countries = list(version.cube.latest().nlargest(n_countries, 'Confirmed')['Country/Region'])
+    start = (version.cube.dates[-1] - pd.Timedelta(days=90)).strftime('%Y-%m-%d')
+    paths = ['/v1/version', '/v1/latest', '/v1/risk', '/v1/risk?format=arrow']
+    for country in countries:
+        paths.append('/v1/timeseries?' + urlencode({'country': country}))
+        paths.append('/v1/timeseries?' + urlencode({'country': country, 'start': start, 'format': 'arrow'}))
+    paths.append('/v1/latest?' + urlencode([('country', country) for country in countries]))
+    return paths
+
+
+def load_test(base_url, paths, rate=300, duration=10, workers=16, revalidate=True):
+    """Send `rate` requests per second for `duration` seconds, cycling through paths.
+
+    Requests are scheduled at fixed times and latency is measured from the
+    scheduled time, so a slow server cannot hide behind the client waiting
+    for it. With revalidate, each connection sends If-None-Match once it has
+    an ETag for a path, as a well-behaved client would.
+    """
+    url = urlsplit(base_url)
+    total = int(rate * duration)
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, statuses, errors = [], Counter(), Counter()
+    started = time.perf_counter() + 0.1
+
+    def run():
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=10)
+        etags = {}
+        while True:
+            with lock:
+                i = next(counter)
+            if i >= total:
+                break
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            path = paths[i % len(paths)]
+            headers = {'If-None-Match': etags[path]} if revalidate and path in etags else {}
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                connection = http.client.HTTPConnection(url.hostname, url.port, timeout=10)
+                with lock:
+                    errors[type(e).__name__] += 1
+                continue
+            latency = time.perf_counter() - scheduled
+            if response.getheader('ETag'):
+                etags[path] = response.getheader('ETag')
+            with lock:
+                latencies.append(latency)
+                statuses[response.status] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=run) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'rate': len(latencies) / elapsed,
+        'target_rate': rate,
+        'statuses': dict(statuses),
+        'errors': dict(errors),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else None
+    }
+
+
+def main(argv=None):
+    from service import DataService
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--source', help='URL, directory or tarball of the JHU files (default: COVID_DATA_SOURCE)')
+    parser.add_argument('--load-test', action='store_true', help='serve on a free port, load it, print the results and exit')
+    parser.add_argument('--url', help='with --load-test, load this running server instead')
+    parser.add_argument('--rate', type=float, default=300, help='load test requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='load test seconds')
+    parser.add_argument('--workers', type=int, default=16, help='load test client connections')
+    parser.add_argument('--no-revalidate', action='store_true', help='load test without If-None-Match')
+    args = parser.parse_args(argv)
+
+    service = DataService.default(args.source)
+    service.restore()
+    if service.current is None:
+        service.refresh()
+
+    if not args.load_test:
+        server = QueryServer(QueryAPI(service.start()), args.host, args.port).start()
+        print(f"Serving {server.base_url}/v1/ (Ctrl+C to stop)", file=sys.stderr)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.stop()
+        return 0
+
+    paths = default_paths(service.current)
+    if args.url:
+        results = load_test(args.url, paths, args.rate, args.duration, args.workers, not args.no_revalidate)
+    else:
+        with QueryServer(QueryAPI(service), args.host, 0) as server:
+            results = load_test(server.base_url, paths, args.rate, args.duration, args.workers, not args.no_revalidate)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,25 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import requests
-import io
+import functools
+import os
+import tempfile
 import warnings
 warnings.filterwarnings('ignore')
 
+from api import QueryAPI, QueryServer
+from charts import create_plotly_visualizations, create_risk_chart, create_seaborn_plots
+from cube import date_bounds
+from downsample import points_for_width
+from export import EXPORT_FORMATS, export_file
+from fetch import FetchError
+from instrument import recorder, span
+from render_cache import RenderCache, figure_png
+from reports import generate_reports, zip_reports
+from risk import RISK_LEVELS
+from service import REFRESH_SECONDS, DataService, load_us_data
+
 # Set page configuration
 st.set_page_config(
     page_title="COVID-19 Regional Impact Tracker",
@@ -205,6 +213,7 @@ st.markdown("""
     .risk-high { background-color: #fef2f2; color: #b91c1c; }
     .risk-medium { background-color: #fefce8; color: #b45309; }
     .risk-low { background-color: #ecfdf5; color: #047857; }
+    .risk-unknown { background-color: #f3f4f6; color: #4b5563; }
     
     /* General Text Styling */
     h1, h2, h3, h4, h5, h6 {
@@ -245,278 +254,282 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Data loading and caching functions
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def load_covid_data():
-    """Load COVID-19 data from Johns Hopkins repository"""
-    try:
-        base_url = "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series"
-        
-        urls = {
-            'confirmed': f"{base_url}/time_series_covid19_confirmed_global.csv",
-            'deaths': f"{base_url}/time_series_covid19_deaths_global.csv",
-            'recovered': f"{base_url}/time_series_covid19_recovered_global.csv"
-        }
-        
-        data = {}
-        for data_type, url in urls.items():
-            try:
-                response = requests.get(url, timeout=10)
-                response.raise_for_status()
-                df = pd.read_csv(io.StringIO(response.text))
-                data[data_type] = df
-                st.success(f"✅ {data_type.capitalize()} data loaded successfully")
-            except Exception as e:
-                st.error(f"❌ Error loading {data_type} data: {str(e)}")
-                return None
-        
-        return data
-    except Exception as e:
-        st.error(f"❌ Failed to load COVID-19 data: {str(e)}")
-        return None
+@st.cache_resource
+def get_data_service():
+    """One dataset per process, refreshed in the background and shared by every session"""
+    service = DataService.default()
+    service.restore()
+    return service.start()
 
-@st.cache_data
-def process_covid_data(raw_data):
-    """Process and clean the COVID-19 data"""
-    if not raw_data:
+@st.cache_resource
+def get_query_server():
+    """Read-only query API over the same data service, started when COVID_API_PORT is set"""
+    if not os.environ.get("COVID_API_PORT"):
         return None
-    
-    processed_data = {}
-    
-    for data_type, df in raw_data.items():
-        df_melted = pd.melt(
-            df, 
-            id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'],
-            var_name='Date', 
-            value_name=data_type.capitalize()
+    return QueryServer(QueryAPI(get_data_service())).start()
+
+@st.cache_resource(ttl=REFRESH_SECONDS, show_spinner="Loading US county data...")
+def get_us_data():
+    """US county/state/national rollups, fetched on first use and shared by every session"""
+    return load_us_data()
+
+@st.cache_resource
+def get_render_cache():
+    """Rendered main-chart PNGs, shared by every session"""
+    return RenderCache()
+
+def summary_report_zip(service, version, countries, date_range):
+    """Zip of per-country HTML/PNG reports, rendered in worker processes from the stored version"""
+    service.persist(version)
+    start, end = date_bounds(date_range)
+    with tempfile.TemporaryDirectory() as output_dir:
+        with span('summary_report'):
+            generate_reports(service.store, version.key, countries, output_dir, start=start, end=end)
+        return zip_reports(output_dir)
+
+def timed_fragment(func):
+    """st.fragment whose runs are timed as the 'fragment:<name>' stage"""
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with span(f'fragment:{func.__name__}'):
+            return func(*args, **kwargs)
+    return st.fragment(run)
+
+def build_chart(name, build):
+    """Run a chart builder inside the 'chart:<name>' span"""
+    with span(f'chart:{name}'):
+        return build()
+
+@timed_fragment
+def render_main_chart(filtered_cube, selected_countries, data_key):
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    # Lives inside the fragment so switching charts reruns only this panel
+    chart_type = st.selectbox(
+        "Select Chart Type",
+        ["Line Plot - Cases Over Time", "Heatmap - Regional Comparison", "Bar Chart - Current Status"],
+        key="chart_select"
+    )
+    st.markdown(f"<div style='margin-bottom: 0.5rem;'><h3>📊 {chart_type}</h3></div>", unsafe_allow_html=True)
+    
+    if not filtered_cube.empty:
+        # Same data, chart and selection -> same image, so only a miss touches matplotlib
+        chart_countries = sorted(selected_countries)
+        render_key = (
+            data_key, chart_type, tuple(chart_countries),
+            filtered_cube.dates[0].date(), filtered_cube.dates[-1].date()
         )
-        
-        df_melted['Date'] = pd.to_datetime(df_melted['Date'])
-        df_melted['Province/State'] = df_melted['Province/State'].fillna(df_melted['Country/Region'])
-        df_country = df_melted.groupby(['Country/Region', 'Date'])[data_type.capitalize()].sum().reset_index()
-        processed_data[data_type] = df_country
-    
-    merged_df = processed_data['confirmed']
-    for data_type in ['deaths', 'recovered']:
-        if data_type in processed_data:
-            merged_df = merged_df.merge(
-                processed_data[data_type], 
-                on=['Country/Region', 'Date'], 
-                how='left'
-            )
+        def render():
+            with span(f'chart:{chart_type}'):
+                return figure_png(create_seaborn_plots(filtered_cube, chart_countries, chart_type))
+
+        png = get_render_cache().get_or_render(render_key, render)
+        if png is not None:
+            st.image(png, use_container_width=True)
+        else:
+            st.warning("No data available for the selected visualization.")
+    else:
+        st.warning("No data available for the selected filters.")
     
-    merged_df = merged_df.fillna(0)
-    merged_df['Active'] = merged_df['Confirmed'] - merged_df['Deaths'] - merged_df.get('Recovered', 0)
-    merged_df['Active'] = merged_df['Active'].clip(lower=0)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def render_risk_panel(filtered_cube, filtered_risk, selected_countries):
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    st.markdown("<div style='margin-bottom: 0.5rem;'><h3>🎯 Regional Risk Assessment</h3></div>", unsafe_allow_html=True)
+    
+    latest_country_data = filtered_cube.latest().set_index('Country/Region')
+    latest_risk = filtered_risk.ranking().set_index('Country/Region')
+    
+    for country in selected_countries:
+        if country in latest_country_data.index:
+            country_data = latest_country_data.loc[country]
+            new_cases = country_data['New_Cases_7MA']
+            confirmed = country_data['Confirmed']
+            deaths = country_data['Deaths']
+            incidence = latest_risk.loc[country, 'Incidence_100k']
+            risk_level, risk_color, risk_class = RISK_LEVELS[latest_risk.loc[country, 'Tier']]
+            incidence_text = f"{incidence:,.1f}/100k (7d)" if not np.isnan(incidence) else "n/a"
+            fatality_rate = (deaths / confirmed * 100) if confirmed > 0 else 0
+            
+            st.markdown(f"""
+            <div style="display: flex; align-items: center; justify-content: space-between; 
+                       padding: 0.75rem; margin-bottom: 0.5rem; background-color: #f9fafb; 
+                       border-radius: 8px; border-left: 4px solid {risk_color};">
+                <div>
+                    <div style="font-weight: 600; color: #1f2937;">{country}</div>
+                    <div style="font-size: 0.8rem; color: #6b7280;">
+                        New Cases: {new_cases:,.0f}/day<br>
+                        Incidence: {incidence_text}<br>
+                        Fatality Rate: {fatality_rate:.1f}%
+                    </div>
+                </div>
+                <div class="risk-badge {risk_class}">{risk_level}</div>
+            </div>
+            """, unsafe_allow_html=True)
     
-    merged_df = merged_df.sort_values(['Country/Region', 'Date'])
-    merged_df['New_Cases'] = merged_df.groupby('Country/Region')['Confirmed'].diff().fillna(0)
-    merged_df['New_Deaths'] = merged_df.groupby('Country/Region')['Deaths'].diff().fillna(0)
+    st.markdown('</div>', unsafe_allow_html=True)
     
-    merged_df['New_Cases_7MA'] = merged_df.groupby('Country/Region')['New_Cases'].rolling(window=7, min_periods=1).mean().reset_index(0, drop=True)
-    merged_df['New_Deaths_7MA'] = merged_df.groupby('Country/Region')['New_Deaths'].rolling(window=7, min_periods=1).mean().reset_index(0, drop=True)
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    st.markdown("<div style='margin-bottom: 0.5rem;'><h3>📋 Quick Stats</h3></div>", unsafe_allow_html=True)
     
-    return merged_df
-
-def create_seaborn_plots(df, selected_countries, plot_type):
-    sns.set_style("whitegrid")
-    plt.rcParams['figure.facecolor'] = 'white'
+    if selected_countries:
+        selected_data = latest_country_data[latest_country_data.index.isin(selected_countries)]
+        if not selected_data.empty:
+            total_selected_confirmed = selected_data['Confirmed'].sum()
+            total_selected_deaths = selected_data['Deaths'].sum()
+            avg_new_cases = selected_data['New_Cases_7MA'].mean()
+            
+            st.markdown(f"""
+            <div style="text-align: center;">
+                <div style="font-size: 1.5rem; font-weight: 700; color: #f59e0b; margin-bottom: 0.5rem;">
+                    {total_selected_confirmed:,.0f}
+                </div>
+                <div style="font-size: 0.8rem; color: #6b7280; margin-bottom: 1rem;">
+                    Total Cases (Selected)
+                </div>
+                <div style="font-size: 1.2rem; font-weight: 600; color: #ef4444; margin-bottom: 0.5rem;">
+                    {total_selected_deaths:,.0f}
+                </div>
+                <div style="font-size: 0.8rem; color: #6b7280; margin-bottom: 1rem;">
+                    Total Deaths (Selected)
+                </div>
+                <div style="font-size: 1rem; font-weight: 500; color: #8b5cf6;">
+                    {avg_new_cases:,.0f}
+                </div>
+                <div style="font-size: 0.8rem; color: #6b7280;">
+                    Avg New Cases/Day
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
     
-    if plot_type == "Line Plot - Cases Over Time":
-        fig, ax = plt.subplots(figsize=(12, 8))
-        colors = ['#f59e0b', '#ef4444', '#10b981', '#8b5cf6', '#06b6d4', '#f97316']
-        
-        for i, country in enumerate(selected_countries):
-            country_data = df[df['Country/Region'] == country]
-            if not country_data.empty:
-                ax.plot(
-                    country_data['Date'], 
-                    country_data['Confirmed'], 
-                    label=country,
-                    linewidth=2.5,
-                    color=colors[i % len(colors)]
-                )
-        
-        ax.set_title('COVID-19 Confirmed Cases Over Time', fontsize=16, fontweight='bold', pad=20)
-        ax.set_xlabel('Date', fontsize=12, fontweight='600')
-        ax.set_ylabel('Confirmed Cases', fontsize=12, fontweight='600')
-        ax.legend(title='Country', title_fontsize=12, fontsize=10)
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format(int(x), ',')))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        return fig
-    
-    elif plot_type == "Heatmap - Regional Comparison":
-        latest_data = df.groupby('Country/Region').last().reset_index()
-        if len(selected_countries) > 0:
-            top_countries = latest_data[latest_data['Country/Region'].isin(selected_countries)]
-        else:
-            top_countries = latest_data.nlargest(15, 'Confirmed')
-        
-        if len(top_countries) == 0:
-            return None
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def render_interactive_analysis(filtered_cube, selected_countries, max_points):
+    if not filtered_cube.empty:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        time_series_func, comparison_func, _ = create_plotly_visualizations(filtered_cube, selected_countries, max_points)
+        st.plotly_chart(build_chart('time_series', time_series_func), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
         
-        heatmap_data = top_countries[['Confirmed', 'Deaths', 'Recovered', 'Active']].T
-        heatmap_data.columns = top_countries['Country/Region']
-        heatmap_data_norm = heatmap_data.div(heatmap_data.sum(axis=0), axis=1)
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        st.plotly_chart(build_chart('comparison', comparison_func), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def render_trend_analysis(filtered_cube, selected_countries, max_points):
+    if not filtered_cube.empty:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        _, _, trends_func = create_plotly_visualizations(filtered_cube, selected_countries, max_points)
+        st.plotly_chart(build_chart('daily_trends', trends_func), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
         
-        fig, ax = plt.subplots(figsize=(15, 6))
-        sns.heatmap(
-            heatmap_data_norm, 
-            annot=False, 
-            cmap='RdYlBu_r', 
-            cbar_kws={'label': 'Proportion'},
-            ax=ax
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        st.markdown("<div style='margin-bottom: 0.5rem;'><h3>📋 Latest Data Summary</h3></div>", unsafe_allow_html=True)
+        summary_data = filtered_cube.latest()[
+            ['Country/Region', 'Confirmed', 'Deaths', 'Recovered', 'Active', 'New_Cases', 'New_Cases_7MA']
+        ].round(1)
+        summary_data.columns = ['Country', 'Total Cases', 'Deaths', 'Recovered', 'Active', 'New Cases', 'New Cases (7MA)']
+        st.dataframe(
+            summary_data,
+            use_container_width=True,
+            hide_index=True
         )
-        ax.set_title('COVID-19 Cases Distribution Heatmap', fontsize=16, fontweight='bold', pad=20)
-        ax.set_xlabel('Countries', fontsize=12, fontweight='600')
-        ax.set_ylabel('Case Types', fontsize=12, fontweight='600')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        return fig
-    
-    elif plot_type == "Bar Chart - Current Status":
-        latest_data = df[df['Date'] == df['Date'].max()]
-        if len(selected_countries) > 0:
-            country_data = latest_data[latest_data['Country/Region'].isin(selected_countries)]
-        else:
-            country_data = latest_data.nlargest(10, 'Confirmed')
-        
-        if len(country_data) == 0:
-            return None
-        
-        fig, ax = plt.subplots(figsize=(12, 8))
-        x = np.arange(len(country_data))
-        width = 0.2
-        
-        ax.bar(x - width*1.5, country_data['Confirmed'], width, label='Confirmed', color='#f59e0b', alpha=0.8)
-        ax.bar(x - width/2, country_data['Deaths'], width, label='Deaths', color='#ef4444', alpha=0.8)
-        ax.bar(x + width/2, country_data.get('Recovered', 0), width, label='Recovered', color='#10b981', alpha=0.8)
-        ax.bar(x + width*1.5, country_data['Active'], width, label='Active', color='#8b5cf6', alpha=0.8)
-        
-        ax.set_title('Current COVID-19 Status by Country', fontsize=16, fontweight='bold', pad=20)
-        ax.set_xlabel('Countries', fontsize=12, fontweight='600')
-        ax.set_ylabel('Number of Cases', fontsize=12, fontweight='600')
-        ax.set_xticks(x)
-        ax.set_xticklabels(country_data['Country/Region'], rotation=45, ha='right')
-        ax.legend()
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format(int(x), ',')))
-        plt.tight_layout()
-        return fig
+        st.markdown('</div>', unsafe_allow_html=True)
 
-def calculate_risk_level(new_cases_per_100k):
-    if new_cases_per_100k > 100:
-        return "High", "#ef4444", "risk-high"
-    elif new_cases_per_100k > 25:
-        return "Medium", "#f59e0b", "risk-medium"
-    else:
-        return "Low", "#10b981", "risk-low"
+@timed_fragment
+def render_risk_ranking(filtered_risk, selected_countries, max_points):
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    st.plotly_chart(
+        build_chart('risk_over_time', lambda: create_risk_chart(filtered_risk, selected_countries, max_points)),
+        use_container_width=True
+    )
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    end_date = filtered_risk.dates[-1].strftime('%Y-%m-%d') if len(filtered_risk.dates) else "-"
+    st.markdown(f"<div style='margin-bottom: 0.5rem;'><h3>🌐 Global Risk Ranking ({end_date})</h3></div>", unsafe_allow_html=True)
+    ranking = filtered_risk.ranking()[['Country/Region', 'Risk', 'Incidence_100k', 'Population']].round(1)
+    ranking.insert(0, 'Rank', range(1, len(ranking) + 1))
+    ranking.columns = ['Rank', 'Country', 'Risk', 'Cases/100k (7d)', 'Population']
+    st.dataframe(
+        ranking,
+        use_container_width=True,
+        hide_index=True
+    )
+    st.markdown('</div>', unsafe_allow_html=True)
 
-def create_plotly_visualizations(df, selected_countries):
-    def create_time_series():
-        fig = go.Figure()
-        colors = ['#f59e0b', '#ef4444', '#10b981', '#8b5cf6', '#06b6d4', '#f97316']
-        
-        for i, country in enumerate(selected_countries):
-            country_data = df[df['Country/Region'] == country]
-            if not country_data.empty:
-                fig.add_trace(go.Scatter(
-                    x=country_data['Date'],
-                    y=country_data['Confirmed'],
-                    mode='lines',
-                    name=country,
-                    line=dict(width=3, color=colors[i % len(colors)]),
-                    hovertemplate=f'<b>{country}</b><br>Date: %{{x}}<br>Cases: %{{y:,.0f}}<extra></extra>'
-                ))
-        
-        fig.update_layout(
-            title="Interactive COVID-19 Cases Timeline",
-            xaxis_title="Date",
-            yaxis_title="Confirmed Cases",
-            hovermode='x unified',
-            height=500,
-            template="plotly_white",
-            showlegend=True
-        )
-        return fig
+US_COUNTIES = "US (states and counties)"
+ALL_STATES = "All states"
+
+def render_region_breakdown(title, label, region_cube, date_range, max_points, extra_columns):
+    """Time series and latest table of one drill-down level; extra_columns are aligned with its rows"""
+    region_cube = region_cube.between(*date_bounds(date_range))
+    if region_cube.empty:
+        return
+    names = list(region_cube.countries)
+    
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    time_series_func, _, _ = create_plotly_visualizations(region_cube, names, max_points)
+    st.plotly_chart(build_chart('province_time_series', time_series_func), use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
     
-    def create_comparison():
-        latest_comparison = df[df['Date'] == df['Date'].max()]
-        filtered_comparison = latest_comparison[latest_comparison['Country/Region'].isin(selected_countries)]
-        
-        fig = go.Figure()
-        metrics = [
-            ('Confirmed', '#f59e0b'),
-            ('Deaths', '#ef4444'),
-            ('Recovered', '#10b981'),
-            ('Active', '#8b5cf6')
-        ]
-        
-        for metric, color in metrics:
-            fig.add_trace(go.Bar(
-                name=metric,
-                x=filtered_comparison['Country/Region'],
-                y=filtered_comparison[metric],
-                marker_color=color,
-                hovertemplate=f'<b>%{{x}}</b><br>{metric}: %{{y:,.0f}}<extra></extra>'
-            ))
-        
-        fig.update_layout(
-            title="Current COVID-19 Status Comparison",
-            xaxis_title="Countries",
-            yaxis_title="Number of Cases",
-            barmode='group',
-            height=500,
-            template="plotly_white"
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    st.markdown(f"<div style='margin-bottom: 0.5rem;'><h3>📍 {title}</h3></div>", unsafe_allow_html=True)
+    summary_data = region_cube.latest()[['Confirmed', 'Deaths', 'Recovered', 'Active', 'New_Cases_7MA']].round(1)
+    summary_data.insert(0, label, names)
+    for column, values in extra_columns.items():
+        summary_data[column] = values
+    st.dataframe(
+        summary_data.sort_values('Confirmed', ascending=False),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def render_province_drilldown(cube, selected_countries, date_range, max_points):
+    regions = cube.regions
+    options = (regions.province_countries if regions is not None else []) + [US_COUNTIES]
+    default = next((options.index(country) for country in selected_countries if country in options), 0)
+    country = st.selectbox("Country", options, index=default, key="drilldown_country")
+    
+    if country != US_COUNTIES:
+        locations = regions.locations(country)
+        render_region_breakdown(
+            f"{country} by Province/State", 'Province/State', regions.provinces(country), date_range, max_points,
+            {'Lat': locations['Lat'].to_numpy(), 'Long': locations['Long'].to_numpy()}
         )
-        return fig
+        return
     
-    def create_daily_trends():
-        fig = make_subplots(
-            rows=2, cols=1,
-            shared_xaxes=True,
-            subplot_titles=['Daily New Cases (7-day MA)', 'Daily New Deaths (7-day MA)']
+    try:
+        us_data = get_us_data()
+    except FetchError as e:
+        st.warning(f"⚠️ US county data is unavailable: {e}")
+        return
+    state = st.selectbox("State", [ALL_STATES, *us_data.states.countries], key="drilldown_state")
+    if state == ALL_STATES:
+        render_region_breakdown(
+            "US by State", 'State', us_data.states, date_range, max_points,
+            {'Population': us_data.state_population}
         )
-        
-        colors = ['#f59e0b', '#ef4444', '#10b981', '#8b5cf6', '#06b6d4', '#f97316']
-        
-        for i, country in enumerate(selected_countries):
-            country_data = df[df['Country/Region'] == country]
-            if not country_data.empty:
-                fig.add_trace(
-                    go.Scatter(
-                        x=country_data['Date'],
-                        y=country_data['New_Cases_7MA'],
-                        name=f'{country} - New Cases',
-                        line=dict(width=2, color=colors[i % len(colors)]),
-                        hovertemplate=f'<b>{country}</b><br>Date: %{{x}}<br>New Cases (7MA): %{{y:,.1f}}<extra></extra>'
-                    ),
-                    row=1, col=1
-                )
-                fig.add_trace(
-                    go.Scatter(
-                        x=country_data['Date'],
-                        y=country_data['New_Deaths_7MA'],
-                        name=f'{country} - New Deaths',
-                        line=dict(width=2, color=colors[i % len(colors)]),
-                        hovertemplate=f'<b>{country}</b><br>Date: %{{x}}<br>New Deaths (7MA): %{{y:,.1f}}<extra></extra>',
-                        showlegend=False
-                    ),
-                    row=2, col=1
-                )
-        
-        fig.update_layout(
-            height=700,
-            template="plotly_white",
-            hovermode='x unified'
+    else:
+        rows = us_data.counties.country_rows[state]
+        locations = us_data.counties.locations(state)
+        render_region_breakdown(
+            f"{state} by County", 'County', us_data.counties.provinces(state), date_range, max_points,
+            {
+                'Population': us_data.county_population[rows],
+                'Lat': locations['Lat'].to_numpy(),
+                'Long': locations['Long'].to_numpy()
+            }
         )
-        return fig
-    
-    return create_time_series, create_comparison, create_daily_trends
 
-# Initialize session state
-if 'data_loaded' not in st.session_state:
-    st.session_state.data_loaded = False
-    st.session_state.covid_data = None
+# Every rerun reads the shared dataset once and keeps that version until it finishes
+data_service = get_data_service()
+query_server = get_query_server()
+data_version = data_service.current
+covid_data = data_version.cube if data_version is not None else None
 
 # Header
 st.markdown("""
@@ -551,30 +564,42 @@ with st.sidebar:
     
     if st.button("Load/Refresh Data", key="load_data"):
         with st.spinner("Loading COVID-19 data from Johns Hopkins..."):
-            raw_data = load_covid_data()
-            if raw_data:
-                with st.spinner("Processing data..."):
-                    st.session_state.covid_data = process_covid_data(raw_data)
-                    st.session_state.data_loaded = True
-                    st.success("✅ Data loaded and processed successfully!")
-            else:
-                st.error("❌ Failed to load data. Please try again.")
-    
-    if st.session_state.data_loaded:
+            try:
+                data_version = data_service.refresh()
+                covid_data = data_version.cube
+                for data_type, result in data_service.last_fetch.items():
+                    if result.not_modified:
+                        st.success(f"✅ {data_type.capitalize()} data unchanged ({result.status} in {result.elapsed:.2f}s)")
+                    else:
+                        st.success(f"✅ {data_type.capitalize()} data loaded successfully ({result.elapsed:.2f}s)")
+                st.success("✅ Data loaded and processed successfully!")
+            except FetchError as e:
+                st.error(f"❌ Error loading {e.data_type} data: {str(e.error)}")
+            except Exception as e:
+                st.error(f"❌ Failed to load COVID-19 data: {str(e)}")
+    
+    if covid_data is not None:
         st.success("📊 Data Status: Loaded")
-        if st.session_state.covid_data is not None:
-            latest_date = st.session_state.covid_data['Date'].max().strftime('%Y-%m-%d')
-            st.info(f"📅 Latest Data: {latest_date}")
+        latest_date = covid_data.dates[-1].strftime('%Y-%m-%d')
+        st.info(f"📅 Latest Data: {latest_date}")
+        st.info(f"🗂️ Data Version: #{data_version.number} ({data_version.key[:8]})")
+        if data_service.last_refresh is not None:
+            st.info(f"🔄 Last Refreshed: {data_service.last_refresh.strftime('%Y-%m-%d %H:%M UTC')}")
+        else:
+            st.info(f"🔄 Restored from cache: {data_version.published_at.strftime('%Y-%m-%d %H:%M UTC')}")
     else:
         st.warning("⚠️ Data Status: Not Loaded")
     
+    if data_service.last_error is not None:
+        st.warning(f"⚠️ Last refresh failed: {str(data_service.last_error)}")
+    
     st.markdown('</div>', unsafe_allow_html=True)
     
-    if st.session_state.data_loaded and st.session_state.covid_data is not None:
+    if covid_data is not None:
         st.markdown('<div class="sidebar-card">', unsafe_allow_html=True)
         st.markdown('<div style="margin-bottom: 0.5rem;"><h3>🌍 Country Selection</h3></div>', unsafe_allow_html=True)
         
-        available_countries = sorted(st.session_state.covid_data['Country/Region'].unique())
+        available_countries = list(covid_data.countries)
         default_countries = ['US', 'India', 'Brazil', 'Russia', 'France', 'United Kingdom', 'Germany', 'Turkey']
         default_selection = [country for country in default_countries if country in available_countries]
         
@@ -591,46 +616,57 @@ with st.sidebar:
         st.markdown('<div class="sidebar-card">', unsafe_allow_html=True)
         st.markdown('<div style="margin-bottom: 0.5rem;"><h3>📈 Visualization Options</h3></div>', unsafe_allow_html=True)
         
-        chart_type = st.selectbox(
-            "Select Chart Type",
-            ["Line Plot - Cases Over Time", "Heatmap - Regional Comparison", "Bar Chart - Current Status"],
-            key="chart_select"
+        min_date = covid_data.dates[0].date()
+        max_date = covid_data.dates[-1].date()
+        
+        date_range = st.date_input(
+            "Select Date Range",
+            value=(max_date - timedelta(days=90), max_date),
+            min_value=min_date,
+            max_value=max_date,
+            key="date_range"
         )
         
-        if st.session_state.covid_data is not None:
-            min_date = st.session_state.covid_data['Date'].min().date()
-            max_date = st.session_state.covid_data['Date'].max().date()
-            
-            date_range = st.date_input(
-                "Select Date Range",
-                value=(max_date - timedelta(days=90), max_date),
-                min_value=min_date,
-                max_value=max_date,
-                key="date_range"
-            )
+        downsample = st.checkbox(
+            "⚡ Downsample long time series",
+            value=True,
+            key="downsample",
+            help="Send about one point per two pixels of chart width to the browser; peaks and the latest values are always kept."
+        )
         
         st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown('<div class="sidebar-card">', unsafe_allow_html=True)
         st.markdown('<div style="margin-bottom: 0.5rem;"><h3>💾 Export Options</h3></div>', unsafe_allow_html=True)
         
-        if st.button("📊 Generate Summary Report", key="generate_report"):
-            if selected_countries:
-                st.success("✅ Summary report feature ready!")
-                st.info("Report would include key metrics, trends, and risk assessments for selected countries.")
+        st.download_button(
+            "📊 Generate Summary Report",
+            data=lambda: summary_report_zip(data_service, data_version, selected_countries, date_range),
+            file_name=f"covid_reports_{covid_data.dates[-1]:%Y%m%d}.zip",
+            mime="application/zip",
+            disabled=not selected_countries,
+            key="generate_report",
+            help="Charts and risk metrics for each selected country, as HTML pages in a zip"
+        )
         
-        if st.button("📥 Export Data (CSV)", key="export_csv"):
-            if selected_countries and st.session_state.covid_data is not None:
-                export_data = st.session_state.covid_data[
-                    st.session_state.covid_data['Country/Region'].isin(selected_countries)
-                ]
-                csv = export_data.to_csv(index=False)
-                st.download_button(
-                    label="⬇️ Download CSV",
-                    data=csv,
-                    file_name=f"covid_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv"
-                )
+        export_format = st.selectbox("Export Format", list(EXPORT_FORMATS), key="export_format")
+        export_scope = st.radio(
+            "Export Scope",
+            ["Selected countries", "All countries"],
+            horizontal=True,
+            key="export_scope"
+        )
+        export_cube = covid_data if export_scope == "All countries" else covid_data.select(selected_countries)
+        extension, mime = EXPORT_FORMATS[export_format]
+        # The file is only written when the button is clicked, in chunks, to a temporary file
+        st.download_button(
+            label="📥 Export Data",
+            data=lambda: export_file(export_cube, export_format),
+            file_name=f"covid_data_{datetime.now().strftime('%Y%m%d')}.{extension}",
+            mime=mime,
+            disabled=export_cube.empty,
+            key="export_data"
+        )
         st.markdown('</div>', unsafe_allow_html=True)
     
     st.markdown('<div class="sidebar-card">', unsafe_allow_html=True)
@@ -641,9 +677,9 @@ with st.sidebar:
     **Update Frequency:** Daily
     
     **Risk Levels:**
-    - **High:** >100 cases/100k
-    - **Medium:** 25-100 cases/100k  
-    - **Low:** <25 cases/100k
+    - **High:** >100 new cases/100k over 7 days
+    - **Medium:** 25-100 new cases/100k over 7 days  
+    - **Low:** <25 new cases/100k over 7 days
     
     **Features:**
     - Real-time data visualization
@@ -656,7 +692,7 @@ with st.sidebar:
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Main content
-if not st.session_state.data_loaded:
+if covid_data is None:
     st.markdown("""
     <div class="glass-card" style="text-align: center; padding: 3rem;">
         <h2 style="color: #1f2937; margin-bottom: 1rem;">Welcome to COVID-19 Regional Impact Tracker</h2>
@@ -674,16 +710,10 @@ if not st.session_state.data_loaded:
     </div>
     """, unsafe_allow_html=True)
 else:
-    df = st.session_state.covid_data
-    
-    if df is not None and not df.empty:
-        latest_global = df[df['Date'] == df['Date'].max()].groupby('Date').agg({
-            'Confirmed': 'sum',
-            'Deaths': 'sum',
-            'Recovered': 'sum',
-            'Active': 'sum',
-            'New_Cases': 'sum'
-        }).iloc[0]
+    cube = covid_data
+    
+    if not cube.empty:
+        latest_global = cube.totals()
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -720,134 +750,43 @@ else:
             """, unsafe_allow_html=True)
         
         if 'selected_countries' in locals() and selected_countries:
-            filtered_df = df[df['Country/Region'].isin(selected_countries)]
-            
-            if len(date_range) == 2:
-                start_date, end_date = date_range
-                filtered_df = filtered_df[
-                    (filtered_df['Date'] >= pd.to_datetime(start_date)) & 
-                    (filtered_df['Date'] <= pd.to_datetime(end_date))
-                ]
+            with span('filter'):
+                filtered_cube = cube.select(selected_countries).between(*date_bounds(date_range))
+                filtered_risk = data_version.risk.between(*date_bounds(date_range))
+            max_points = points_for_width() if downsample else None
             
-            tab1, tab2, tab3 = st.tabs(["📊 Main Chart", "🎯 Interactive Analysis", "📈 Trend Analysis"])
+            # Only the open tab runs, and each panel is a fragment that reruns on its own
+            tab1, tab2, tab3, tab4, tab5 = st.tabs(
+                ["📊 Main Chart", "🎯 Interactive Analysis", "📈 Trend Analysis", "📍 Provinces", "⚠️ Risk Ranking"],
+                key="analysis_tab",
+                on_change="rerun"
+            )
             
-            with tab1:
-                col1, col2 = st.columns([2, 1])
-                
-                with col1:
-                    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                    st.markdown(f"<div style='margin-bottom: 0.5rem;'><h3>📊 {chart_type}</h3></div>", unsafe_allow_html=True)
+            if tab1.open:
+                with tab1:
+                    col1, col2 = st.columns([2, 1])
                     
-                    if not filtered_df.empty:
-                        fig = create_seaborn_plots(filtered_df, selected_countries, chart_type)
-                        if fig is not None:
-                            st.pyplot(fig)
-                            plt.close(fig)
-                        else:
-                            st.warning("No data available for the selected visualization.")
-                    else:
-                        st.warning("No data available for the selected filters.")
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                    st.markdown("<div style='margin-bottom: 0.5rem;'><h3>🎯 Regional Risk Assessment</h3></div>", unsafe_allow_html=True)
-                    
-                    latest_country_data = filtered_df[filtered_df['Date'] == filtered_df['Date'].max()]
-                    
-                    for country in selected_countries:
-                        country_data = latest_country_data[latest_country_data['Country/Region'] == country]
-                        if not country_data.empty:
-                            new_cases = country_data['New_Cases_7MA'].iloc[0]
-                            confirmed = country_data['Confirmed'].iloc[0]
-                            deaths = country_data['Deaths'].iloc[0]
-                            risk_score = new_cases / 1000
-                            risk_level, risk_color, risk_class = calculate_risk_level(risk_score)
-                            fatality_rate = (deaths / confirmed * 100) if confirmed > 0 else 0
-                            
-                            st.markdown(f"""
-                            <div style="display: flex; align-items: center; justify-content: space-between; 
-                                       padding: 0.75rem; margin-bottom: 0.5rem; background-color: #f9fafb; 
-                                       border-radius: 8px; border-left: 4px solid {risk_color};">
-                                <div>
-                                    <div style="font-weight: 600; color: #1f2937;">{country}</div>
-                                    <div style="font-size: 0.8rem; color: #6b7280;">
-                                        New Cases: {new_cases:,.0f}/day<br>
-                                        Fatality Rate: {fatality_rate:.1f}%
-                                    </div>
-                                </div>
-                                <div class="risk-badge {risk_class}">{risk_level}</div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                    st.markdown("<div style='margin-bottom: 0.5rem;'><h3>📋 Quick Stats</h3></div>", unsafe_allow_html=True)
+                    with col1:
+                        render_main_chart(filtered_cube, selected_countries, data_version.key)
                     
-                    if selected_countries:
-                        selected_data = latest_country_data[latest_country_data['Country/Region'].isin(selected_countries)]
-                        if not selected_data.empty:
-                            total_selected_confirmed = selected_data['Confirmed'].sum()
-                            total_selected_deaths = selected_data['Deaths'].sum()
-                            avg_new_cases = selected_data['New_Cases_7MA'].mean()
-                            
-                            st.markdown(f"""
-                            <div style="text-align: center;">
-                                <div style="font-size: 1.5rem; font-weight: 700; color: #f59e0b; margin-bottom: 0.5rem;">
-                                    {total_selected_confirmed:,.0f}
-                                </div>
-                                <div style="font-size: 0.8rem; color: #6b7280; margin-bottom: 1rem;">
-                                    Total Cases (Selected)
-                                </div>
-                                <div style="font-size: 1.2rem; font-weight: 600; color: #ef4444; margin-bottom: 0.5rem;">
-                                    {total_selected_deaths:,.0f}
-                                </div>
-                                <div style="font-size: 0.8rem; color: #6b7280; margin-bottom: 1rem;">
-                                    Total Deaths (Selected)
-                                </div>
-                                <div style="font-size: 1rem; font-weight: 500; color: #8b5cf6;">
-                                    {avg_new_cases:,.0f}
-                                </div>
-                                <div style="font-size: 0.8rem; color: #6b7280;">
-                                    Avg New Cases/Day
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
+                    with col2:
+                        render_risk_panel(filtered_cube, filtered_risk, selected_countries)
             
-            with tab2:
-                if filtered_df is not None and not filtered_df.empty:
-                    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                    time_series_func, comparison_func, trends_func = create_plotly_visualizations(filtered_df, selected_countries)
-                    st.plotly_chart(time_series_func(), use_container_width=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                    st.plotly_chart(comparison_func(), use_container_width=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
+            if tab2.open:
+                with tab2:
+                    render_interactive_analysis(filtered_cube, selected_countries, max_points)
             
-            with tab3:
-                if filtered_df is not None and not filtered_df.empty:
-                    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                    time_series_func, comparison_func, trends_func = create_plotly_visualizations(filtered_df, selected_countries)
-                    st.plotly_chart(trends_func(), use_container_width=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                    st.markdown("<div style='margin-bottom: 0.5rem;'><h3>📋 Latest Data Summary</h3></div>", unsafe_allow_html=True)
-                    summary_data = filtered_df[filtered_df['Date'] == filtered_df['Date'].max()][
-                        ['Country/Region', 'Confirmed', 'Deaths', 'Recovered', 'Active', 'New_Cases', 'New_Cases_7MA']
-                    ].round(1)
-                    summary_data.columns = ['Country', 'Total Cases', 'Deaths', 'Recovered', 'Active', 'New Cases', 'New Cases (7MA)']
-                    st.dataframe(
-                        summary_data,
-                        use_container_width=True,
-                        hide_index=True
-                    )
-                    st.markdown('</div>', unsafe_allow_html=True)
+            if tab3.open:
+                with tab3:
+                    render_trend_analysis(filtered_cube, selected_countries, max_points)
+            
+            if tab4.open:
+                with tab4:
+                    render_province_drilldown(cube, selected_countries, date_range, max_points)
+            
+            if tab5.open:
+                with tab5:
+                    render_risk_ranking(filtered_risk, selected_countries, max_points)
         
         else:
             st.markdown("""
@@ -868,16 +807,32 @@ else:
             ⚠️ For professional health department use
         </div>
         """.format(
-            last_update=df['Date'].max().strftime('%Y-%m-%d %H:%M UTC') if df is not None and not df.empty else 'N/A'
+            last_update=cube.dates[-1].strftime('%Y-%m-%d %H:%M UTC')
         ), unsafe_allow_html=True)
     
     else:
         st.error("❌ Error processing data. Please try refreshing the data.")
 
-if st.session_state.data_loaded and st.session_state.covid_data is not None:
+if covid_data is not None:
     with st.expander("🔧 Technical Information"):
         st.write(f"**Dataset Info:**")
-        st.write(f"- Total records: {len(st.session_state.covid_data):,}")
-        st.write(f"- Countries: {st.session_state.covid_data['Country/Region'].nunique()}")
-        st.write(f"- Date range: {st.session_state.covid_data['Date'].min().date()} to {st.session_state.covid_data['Date'].max().date()}")
-        st.write(f"- Memory usage: {st.session_state.covid_data.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+        st.write(f"- Total records: {len(covid_data):,}")
+        st.write(f"- Countries: {len(covid_data.countries)}")
+        st.write(f"- Date range: {covid_data.dates[0].date()} to {covid_data.dates[-1].date()}")
+        st.write(f"- Memory usage: {covid_data.nbytes / 1024**2:.1f} MB")
+        render_stats = get_render_cache().stats()
+        st.write(
+            f"- Chart cache: {render_stats['entries']} images, {render_stats['bytes'] / 1024**2:.1f} MB, "
+            f"{render_stats['hits']} hits / {render_stats['misses']} misses"
+        )
+        if query_server is not None:
+            st.write(f"- Query API: {query_server.base_url}/v1/")
+        
+        stage_timings = recorder.summary()
+        if stage_timings:
+            st.write(f"**Stage Timings (last {recorder.history} runs per stage):**")
+            stage_table = pd.DataFrame(stage_timings).round(1)
+            stage_table.columns = ['Stage', 'Runs', 'Last (ms)', 'Mean (ms)', 'Max (ms)', 'Peak Alloc (MB)']
+            if recorder.mode != 'memory':
+                stage_table = stage_table.drop(columns='Peak Alloc (MB)')
+            st.dataframe(stage_table, use_container_width=True, hide_index=True)
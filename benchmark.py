@@ -0,0 +1,241 @@
+"""Headless benchmarks of the data pipeline and chart builders.
+
+Generates synthetic JHU-shaped wide CSVs (Province/State, Country/Region,
+Lat, Long, then one column per day) at several scales and times each stage
+separately: ingestion, processing, filtering, and figure construction for
+create_seaborn_plots and create_plotly_visualizations. Results are written
+as JSON so runs can be compared for regressions:
+
+    python benchmark.py --scales small medium --output before.json
+    python benchmark.py --scales small medium --compare before.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from charts import create_plotly_visualizations, create_seaborn_plots
+from downsample import points_for_width
+from fetch import JHU_FILES, FetchResult, content_digest
+from service import parse_covid_data, process_covid_data
+
+# name -> (regions, days)
+SCALES = {
+    'small': (300, 400),
+    'medium': (3000, 1200),
+    'large': (20000, 3000)
+}
+DEFAULT_SCALES = ('small', 'medium')
+REGIONS_PER_COUNTRY = 8
+SELECTED_COUNTRIES = 8
+FILTER_DAYS = 90
+PLOT_TYPES = ("Line Plot - Cases Over Time", "Heatmap - Regional Comparison", "Bar Chart - Current Status")
+
+
+def synthetic_jhu(n_regions, n_days, seed=0):
+    """{data_type: CSV bytes} laid out like the JHU global time series files.
+
+    Regions are grouped into countries of up to REGIONS_PER_COUNTRY provinces;
+    a country with one region has no Province/State, as in the real files.
+    Daily cases come in waves, deaths and recoveries follow from them.
+    """
+    rng = np.random.default_rng(seed)
+    country_ids = np.arange(n_regions) // REGIONS_PER_COUNTRY
+    sizes = np.bincount(country_ids)
+    provinces = np.where(
+        sizes[country_ids] > 1,
+        np.char.add('Province ', (np.arange(n_regions) % REGIONS_PER_COUNTRY).astype(str)),
+        ''
+    )
+    ids = pd.DataFrame({
+        'Province/State': pd.Series(provinces).replace('', np.nan),
+        'Country/Region': np.char.add('Country ', np.char.zfill(country_ids.astype(str), 5)),
+        'Lat': rng.uniform(-60, 70, n_regions).round(4),
+        'Long': rng.uniform(-180, 180, n_regions).round(4)
+    })
+    date_columns = [f'{d.month}/{d.day}/{d:%y}' for d in pd.date_range('2020-01-22', periods=n_days)]
+
+    days = np.arange(n_days)
+    scale = rng.gamma(1.5, 200, n_regions)[:, np.newaxis]
+    phase = rng.uniform(0, 2 * np.pi, n_regions)[:, np.newaxis]
+    waves = scale * (1.1 + np.sin(days / 60 + phase)) * np.minimum(days / 60, 1)
+    new_cases = rng.poisson(waves)
+    new_deaths = rng.binomial(new_cases, 0.015)
+    new_recovered = np.zeros_like(new_cases)
+    new_recovered[:, 14:] = rng.binomial(new_cases[:, :-14], 0.9)
+
+    files = {}
+    for data_type, new in [('confirmed', new_cases), ('deaths', new_deaths), ('recovered', new_recovered)]:
+        values = pd.DataFrame(np.cumsum(new, axis=1), columns=date_columns)
+        buffer = io.BytesIO()
+        pd.concat([ids, values], axis=1).to_csv(buffer, index=False)
+        files[data_type] = buffer.getvalue()
+    return files
+
+
+def load_or_generate(scale, data_dir=None, seed=0):
+    """Synthetic files for a scale, cached in data_dir when one is given"""
+    n_regions, n_days = SCALES[scale]
+    if data_dir is None:
+        return synthetic_jhu(n_regions, n_days, seed)
+
+    directory = os.path.join(data_dir, f'{scale}-{n_regions}x{n_days}-{seed}')
+    paths = {data_type: os.path.join(directory, JHU_FILES[data_type]) for data_type in JHU_FILES}
+    if not all(os.path.exists(path) for path in paths.values()):
+        os.makedirs(directory, exist_ok=True)
+        for data_type, content in synthetic_jhu(n_regions, n_days, seed).items():
+            with open(paths[data_type], 'wb') as f:
+                f.write(content)
+    files = {}
+    for data_type, path in paths.items():
+        with open(path, 'rb') as f:
+            files[data_type] = f.read()
+    return files
+
+
+def fetch_results(files):
+    """Wrap raw file contents the way JHUFetcher.fetch_all returns them"""
+    return {
+        data_type: FetchResult(data_type, JHU_FILES[data_type], content, 200, 0.0, False, content_digest(content))
+        for data_type, content in files.items()
+    }
+
+
+def time_stage(func, repeat, warmup=1):
+    """Seconds per run of func() over `repeat` runs, after `warmup` untimed ones"""
+    for _ in range(warmup):
+        func()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def _drop_last_day(raw_data):
+    return {data_type: df.iloc[:, :-1] for data_type, df in raw_data.items()}
+
+
+def benchmark_scale(scale, repeat=3, data_dir=None):
+    """Time every stage at one scale; returns a list of result rows"""
+    n_regions, n_days = SCALES[scale]
+    files = load_or_generate(scale, data_dir)
+    results = fetch_results(files)
+
+    raw_data = parse_covid_data(results)
+    cube = process_covid_data(raw_data)
+    yesterday = _drop_last_day(raw_data)
+    previous = (process_covid_data(yesterday), yesterday)
+
+    selection = list(cube.latest().nlargest(SELECTED_COUNTRIES, 'Confirmed')['Country/Region'])
+    start = cube.dates[-1] - pd.Timedelta(days=FILTER_DAYS)
+    history = cube.select(selection)
+
+    def seaborn(plot_type):
+        def run():
+            plt.close(create_seaborn_plots(history, selection, plot_type))
+        return run
+
+    def plotly(index, max_points):
+        return lambda: create_plotly_visualizations(history, selection, max_points)[index]()
+
+    stages = [
+        ('ingest', lambda: parse_covid_data(results)),
+        ('process', lambda: process_covid_data(raw_data)),
+        ('process_incremental', lambda: process_covid_data(raw_data, previous)),
+        ('filter', lambda: cube.select(selection).between(start, None).latest())
+    ]
+    stages += [(f'seaborn:{plot_type.split(" - ")[0]}', seaborn(plot_type)) for plot_type in PLOT_TYPES]
+    for max_points, suffix in [(None, ''), (points_for_width(), ':downsampled')]:
+        stages += [
+            (f'plotly:time_series{suffix}', plotly(0, max_points)),
+            (f'plotly:daily_trends{suffix}', plotly(2, max_points))
+        ]
+    stages.append(('plotly:comparison', plotly(1, None)))
+
+    rows = []
+    for stage, func in stages:
+        timing = time_stage(func, repeat)
+        rows.append({
+            'scale': scale,
+            'regions': n_regions,
+            'days': n_days,
+            'countries': len(cube.countries),
+            'input_bytes': sum(len(content) for content in files.values()),
+            'stage': stage,
+            'seconds': timing
+        })
+        print(f"{scale:>8} {stage:<32} {timing['median'] * 1000:10.1f} ms", file=sys.stderr)
+    return rows
+
+
+def compare(results, baseline, tolerance):
+    """Print median ratios against a baseline run; returns the regressed stages"""
+    before = {(row['scale'], row['stage']): row['seconds']['median'] for row in baseline['results']}
+    regressions = []
+    for row in results['results']:
+        key = (row['scale'], row['stage'])
+        if key not in before:
+            continue
+        ratio = row['seconds']['median'] / before[key] if before[key] > 0 else float('inf')
+        flag = ' REGRESSION' if ratio > tolerance else ''
+        print(f"{key[0]:>8} {key[1]:<32} {before[key] * 1000:10.1f} -> {row['seconds']['median'] * 1000:10.1f} ms  x{ratio:.2f}{flag}", file=sys.stderr)
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data-dir', help='keep generated CSVs here and reuse them on later runs')
+    parser.add_argument('--output', help='write JSON results here instead of stdout')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'matplotlib': matplotlib.__version__
+        },
+        'repeat': args.repeat,
+        'results': [row for scale in args.scales for row in benchmark_scale(scale, args.repeat, args.data_dir)]
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
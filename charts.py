@@ -0,0 +1,260 @@
+"""Seaborn and Plotly chart builders for the dashboard, usable without Streamlit.
+
+The plotting libraries are imported inside the builders on first use, so
+starting the app and showing its welcome screen does not pay for them.
+"""
+import numpy as np
+
+from downsample import downsample_indices
+
+
+def create_seaborn_plots(data, selected_countries, plot_type):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_style("whitegrid")
+    plt.rcParams['figure.facecolor'] = 'white'
+
+    if plot_type == "Line Plot - Cases Over Time":
+        fig, ax = plt.subplots(figsize=(12, 8))
+        colors = ['#f59e0b', '#ef4444', '#10b981', '#8b5cf6', '#06b6d4', '#f97316']
+
+        for i, country in enumerate(selected_countries):
+            if country in data:
+                country_data = data.country(country)
+                ax.plot(
+                    country_data.index,
+                    country_data['Confirmed'],
+                    label=country,
+                    linewidth=2.5,
+                    color=colors[i % len(colors)]
+                )
+
+        ax.set_title('COVID-19 Confirmed Cases Over Time', fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel('Date', fontsize=12, fontweight='600')
+        ax.set_ylabel('Confirmed Cases', fontsize=12, fontweight='600')
+        ax.legend(title='Country', title_fontsize=12, fontsize=10)
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format(int(x), ',')))
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        return fig
+
+    elif plot_type == "Heatmap - Regional Comparison":
+        latest_data = data.latest()
+        if len(selected_countries) > 0:
+            top_countries = latest_data[latest_data['Country/Region'].isin(selected_countries)]
+        else:
+            top_countries = latest_data.nlargest(15, 'Confirmed')
+
+        if len(top_countries) == 0:
+            return None
+
+        heatmap_data = top_countries[['Confirmed', 'Deaths', 'Recovered', 'Active']].T
+        heatmap_data.columns = top_countries['Country/Region']
+        heatmap_data_norm = heatmap_data.div(heatmap_data.sum(axis=0), axis=1)
+
+        fig, ax = plt.subplots(figsize=(15, 6))
+        sns.heatmap(
+            heatmap_data_norm,
+            annot=False,
+            cmap='RdYlBu_r',
+            cbar_kws={'label': 'Proportion'},
+            ax=ax
+        )
+        ax.set_title('COVID-19 Cases Distribution Heatmap', fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel('Countries', fontsize=12, fontweight='600')
+        ax.set_ylabel('Case Types', fontsize=12, fontweight='600')
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
+        return fig
+
+    elif plot_type == "Bar Chart - Current Status":
+        latest_data = data.latest()
+        if len(selected_countries) > 0:
+            country_data = latest_data[latest_data['Country/Region'].isin(selected_countries)]
+        else:
+            country_data = latest_data.nlargest(10, 'Confirmed')
+
+        if len(country_data) == 0:
+            return None
+
+        fig, ax = plt.subplots(figsize=(12, 8))
+        x = np.arange(len(country_data))
+        width = 0.2
+
+        ax.bar(x - width*1.5, country_data['Confirmed'], width, label='Confirmed', color='#f59e0b', alpha=0.8)
+        ax.bar(x - width/2, country_data['Deaths'], width, label='Deaths', color='#ef4444', alpha=0.8)
+        ax.bar(x + width/2, country_data.get('Recovered', 0), width, label='Recovered', color='#10b981', alpha=0.8)
+        ax.bar(x + width*1.5, country_data['Active'], width, label='Active', color='#8b5cf6', alpha=0.8)
+
+        ax.set_title('Current COVID-19 Status by Country', fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel('Countries', fontsize=12, fontweight='600')
+        ax.set_ylabel('Number of Cases', fontsize=12, fontweight='600')
+        ax.set_xticks(x)
+        ax.set_xticklabels(country_data['Country/Region'], rotation=45, ha='right')
+        ax.legend()
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format(int(x), ',')))
+        plt.tight_layout()
+        return fig
+
+
+# Above this many plotted points a figure's lines are drawn with WebGL instead of SVG
+WEBGL_POINT_THRESHOLD = 10000
+
+
+def create_risk_chart(risk, selected_countries, max_points=None):
+    """Incidence per 100k over time for the selected countries, over the risk tier bands"""
+    import plotly.graph_objects as go
+
+    from risk import RISK_LEVELS, RISK_THRESHOLDS
+
+    colors = ['#f59e0b', '#ef4444', '#10b981', '#8b5cf6', '#06b6d4', '#f97316']
+    # Only the plotted rows are downsampled, not the whole incidence plane
+    risk = risk.select(selected_countries)
+    countries = list(risk.countries)
+    keep = downsample_indices(np.nan_to_num(risk.incidence), max_points)
+    scatter = go.Scattergl if sum(len(rows) for rows in keep) > WEBGL_POINT_THRESHOLD else go.Scatter
+
+    fig = go.Figure()
+    bounds = [0, *RISK_THRESHOLDS, None]
+    for tier, (low, high) in enumerate(zip(bounds[:-1], bounds[1:])):
+        label, color, _ = RISK_LEVELS[tier]
+        if high is None:
+            high = max(RISK_THRESHOLDS[-1] * 2, float(np.nanmax(risk.incidence, initial=0)))
+        fig.add_hrect(y0=low, y1=high, fillcolor=color, opacity=0.08, line_width=0, layer='below')
+
+    fig.add_traces([
+        scatter(
+            x=risk.dates[keep[row]],
+            y=risk.incidence[row, keep[row]],
+            name=country,
+            meta=country,
+            mode='lines',
+            line=dict(width=2, color=colors[row % len(colors)]),
+            hovertemplate='<b>%{meta}</b><br>Date: %{x}<br>Cases/100k (7d): %{y:,.1f}<extra></extra>'
+        )
+        for row, country in enumerate(countries)
+    ])
+
+    fig.update_layout(
+        title="Risk Over Time (7-day cases per 100k)",
+        xaxis_title="Date",
+        yaxis_title="Cases per 100k (7 days)",
+        hovermode='x unified',
+        height=500,
+        template="plotly_white",
+        showlegend=True
+    )
+    return fig
+
+
+def create_plotly_visualizations(data, selected_countries, max_points=None):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    colors = ['#f59e0b', '#ef4444', '#10b981', '#8b5cf6', '#06b6d4', '#f97316']
+    countries = [country for country in selected_countries if country in data]
+    rows = [data.country_index[country] for country in countries]
+
+    def sample(metric):
+        """Date positions to plot per country row; all of them unless max_points is set"""
+        return downsample_indices(data[metric], max_points)
+
+    def use_webgl(*samples):
+        return sum(len(keep[row]) for keep in samples for row in rows) > WEBGL_POINT_THRESHOLD
+
+    def line_traces(metric, keep, label, value_format, width, webgl, name_suffix='', **kwargs):
+        """One line per selected country in a single pass over the metric plane"""
+        scatter = go.Scattergl if webgl else go.Scatter
+        plane = data[metric]
+        # meta carries the country, so every trace shares one hover template
+        hovertemplate = f'<b>%{{meta}}</b><br>Date: %{{x}}<br>{label}: %{{y:{value_format}}}<extra></extra>'
+        return [
+            scatter(
+                x=data.dates[keep[row]],
+                y=plane[row, keep[row]],
+                name=f'{country}{name_suffix}',
+                meta=country,
+                line=dict(width=width, color=colors[i % len(colors)]),
+                hovertemplate=hovertemplate,
+                **kwargs
+            )
+            for i, (country, row) in enumerate(zip(countries, rows))
+        ]
+
+    def create_time_series():
+        fig = go.Figure()
+        keep = sample('Confirmed')
+        fig.add_traces(line_traces('Confirmed', keep, 'Cases', ',.0f', 3, use_webgl(keep), mode='lines'))
+
+        fig.update_layout(
+            title="Interactive COVID-19 Cases Timeline",
+            xaxis_title="Date",
+            yaxis_title="Confirmed Cases",
+            hovermode='x unified',
+            height=500,
+            template="plotly_white",
+            showlegend=True
+        )
+        return fig
+
+    def create_comparison():
+        latest_comparison = data.latest()
+        filtered_comparison = latest_comparison[latest_comparison['Country/Region'].isin(selected_countries)]
+
+        fig = go.Figure()
+        metrics = [
+            ('Confirmed', '#f59e0b'),
+            ('Deaths', '#ef4444'),
+            ('Recovered', '#10b981'),
+            ('Active', '#8b5cf6')
+        ]
+
+        for metric, color in metrics:
+            fig.add_trace(go.Bar(
+                name=metric,
+                x=filtered_comparison['Country/Region'],
+                y=filtered_comparison[metric],
+                marker_color=color,
+                hovertemplate=f'<b>%{{x}}</b><br>{metric}: %{{y:,.0f}}<extra></extra>'
+            ))
+
+        fig.update_layout(
+            title="Current COVID-19 Status Comparison",
+            xaxis_title="Countries",
+            yaxis_title="Number of Cases",
+            barmode='group',
+            height=500,
+            template="plotly_white"
+        )
+        return fig
+
+    def create_daily_trends():
+        fig = make_subplots(
+            rows=2, cols=1,
+            shared_xaxes=True,
+            subplot_titles=['Daily New Cases (7-day MA)', 'Daily New Deaths (7-day MA)']
+        )
+
+        keep_cases = sample('New_Cases_7MA')
+        keep_deaths = sample('New_Deaths_7MA')
+        webgl = use_webgl(keep_cases, keep_deaths)
+
+        case_traces = line_traces('New_Cases_7MA', keep_cases, 'New Cases (7MA)', ',.1f', 2, webgl, ' - New Cases')
+        death_traces = line_traces(
+            'New_Deaths_7MA', keep_deaths, 'New Deaths (7MA)', ',.1f', 2, webgl, ' - New Deaths', showlegend=False
+        )
+        fig.add_traces(
+            case_traces + death_traces,
+            rows=[1] * len(case_traces) + [2] * len(death_traces),
+            cols=1
+        )
+
+        fig.update_layout(
+            height=700,
+            template="plotly_white",
+            hovermode='x unified'
+        )
+        return fig
+
+    return create_time_series, create_comparison, create_daily_trends
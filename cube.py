@@ -0,0 +1,369 @@
+"""Dense metric x country x date model of the JHU time series"""
+
+import numpy as np
+import pandas as pd
+
+from instrument import span
+from rolling import deltas, rolling_mean
+
+ID_COLUMNS = ['Province/State', 'Country/Region', 'Lat', 'Long']
+SOURCE_METRICS = ('Confirmed', 'Deaths', 'Recovered')
+COUNT_METRICS = SOURCE_METRICS + ('Active',)
+RATE_METRICS = ('New_Cases', 'New_Deaths', 'New_Cases_7MA', 'New_Deaths_7MA')
+METRICS = COUNT_METRICS + RATE_METRICS
+_COUNT_POS = {metric: i for i, metric in enumerate(COUNT_METRICS)}
+_RATE_POS = {metric: i for i, metric in enumerate(RATE_METRICS)}
+DATE_FORMAT = '%m/%d/%y'  # JHU column headers, e.g. 1/22/20
+SEED_DAYS = 7  # one earlier day for the diff plus six for the 7-day MA window
+
+
+class CovidCube:
+    """Every metric as (metric, country, date) arrays.
+
+    Cumulative counts are held in one int32 array and the daily changes and
+    moving averages in one float32 array, half the size of the float64 frame
+    they replace; __getitem__ hides the split.
+
+    Countries are sorted and dates ascending, so the long view of a cube is
+    the old melted frame sorted by ['Country/Region', 'Date'] and each
+    country's history is one contiguous row of each metric plane. The
+    country -> row index is built once, so slicing a country never scans.
+
+    The latest-date snapshot and global totals are computed once per cube
+    and handed down to selections that end on the same date.
+
+    A cube built from the raw files also carries `regions`, the same
+    metrics per province/state (see RegionCube); selections do not.
+    """
+
+    metrics = METRICS
+
+    def __init__(self, countries, dates, counts, rates, latest=None, regions=None):
+        self.countries = pd.Index(countries)
+        self.dates = pd.DatetimeIndex(dates)
+        self.counts = counts
+        self.rates = rates
+        self.regions = regions
+        self.country_index = {country: i for i, country in enumerate(self.countries)}
+        self._latest = latest
+        self._totals = None
+
+    def __contains__(self, country):
+        return country in self.country_index
+
+    def __len__(self):
+        return len(self.countries) * len(self.dates)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        regions = self.regions.nbytes if self.regions is not None else 0
+        return self.counts.nbytes + self.rates.nbytes + regions
+
+    def __getitem__(self, metric):
+        """(country, date) plane of one metric"""
+        if metric in _COUNT_POS:
+            return self.counts[_COUNT_POS[metric]]
+        return self.rates[_RATE_POS[metric]]
+
+    def select(self, countries):
+        """Cube restricted to the given countries, in the order given"""
+        countries = [country for country in countries if country in self.country_index]
+        rows = [self.country_index[country] for country in countries]
+        latest = None
+        if self._latest is not None:
+            latest = self._latest.iloc[rows].reset_index(drop=True)
+        return CovidCube(countries, self.dates, self.counts[:, rows, :], self.rates[:, rows, :], latest)
+
+    def between(self, start=None, end=None):
+        """Cube restricted to start <= date <= end (a view, not a copy).
+
+        Either bound may be None for an open-ended range, and start == end
+        selects that single day. The date axis is sorted and shared by every
+        country, so this is two binary searches and a slice.
+        """
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        # The last-day snapshot still holds if the slice is non-empty and ends on the last day
+        latest = self._latest if lo < hi == len(self.dates) else None
+        return CovidCube(
+            self.countries, self.dates[lo:hi], self.counts[:, :, lo:hi], self.rates[:, :, lo:hi], latest
+        )
+
+    def country(self, country):
+        """Date-indexed frame of every metric for one country"""
+        row = self.country_index[country]
+        return pd.DataFrame({metric: self[metric][row] for metric in self.metrics}, index=self.dates)
+
+    def latest(self):
+        """One row per country with every metric on the last date (shared; do not modify)"""
+        if self._latest is None:
+            if len(self.dates) == 0:
+                frame = pd.DataFrame(columns=['Country/Region', *self.metrics])
+            else:
+                frame = pd.DataFrame({metric: self[metric][:, -1] for metric in self.metrics})
+                frame.insert(0, 'Country/Region', self.countries)
+            self._latest = frame
+        return self._latest
+
+    def totals(self):
+        """Sum of every metric over all countries on the last date"""
+        if self._totals is None:
+            self._totals = self.latest()[list(self.metrics)].sum()
+        return self._totals
+
+    def to_frame(self):
+        """Long ['Country/Region', 'Date', *metrics] view for charts and export"""
+        n_countries, n_dates = len(self.countries), len(self.dates)
+        frame = pd.DataFrame({
+            'Country/Region': pd.Categorical.from_codes(
+                np.repeat(np.arange(n_countries), n_dates), categories=self.countries
+            ),
+            'Date': np.tile(self.dates.to_numpy(), n_countries)
+        })
+        for metric in self.metrics:
+            frame[metric] = self[metric].reshape(-1)
+        return frame
+
+
+class RegionCube:
+    """Every metric per region (a row of the confirmed file) as (metric, region, date) arrays.
+
+    `regions` holds each row's Country/Region, Province/State ('' for a
+    whole country), Lat and Long, sorted by country and then province, so
+    the provinces of a country are one contiguous slice of every plane.
+    The slice of each country is found once, which makes a drill-down a
+    dictionary lookup and a view of the pre-aggregated arrays.
+    """
+
+    def __init__(self, regions, dates, counts, rates):
+        self.regions = regions.reset_index(drop=True)
+        self.dates = pd.DatetimeIndex(dates)
+        self.counts = counts
+        self.rates = rates
+        countries = self.regions['Country/Region'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, countries[1:] != countries[:-1]]) if len(countries) else []
+        stops = list(starts[1:]) + [len(countries)]
+        self.country_rows = {countries[start]: slice(start, stop) for start, stop in zip(starts, stops)}
+        named = self.regions['Province/State'].to_numpy() != ''
+        # Countries reported by province/state rather than as a single row
+        self.province_countries = [
+            country for country, rows in self.country_rows.items() if named[rows].any()
+        ]
+        self._provinces = {}
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.rates.nbytes
+
+    def locations(self, country):
+        """Province/State, Lat and Long of a country's regions"""
+        return self.regions.iloc[self.country_rows[country]][['Province/State', 'Lat', 'Long']]
+
+    def provinces(self, country):
+        """CovidCube of one country whose rows are its provinces (shared views, built once)"""
+        cube = self._provinces.get(country)
+        if cube is None:
+            rows = self.country_rows[country]
+            labels = self.regions['Province/State'].iloc[rows].replace('', country)
+            cube = CovidCube(labels, self.dates, self.counts[:, rows, :], self.rates[:, rows, :])
+            self._provinces[country] = cube
+        return cube
+
+
+def date_bounds(selection):
+    """(start, end) for CovidCube.between from a st.date_input value.
+
+    Accepts a single date, or a range tuple of zero, one or two dates; a
+    range with only its start picked so far is open-ended.
+    """
+    if selection is None:
+        return None, None
+    if isinstance(selection, (tuple, list)):
+        start = selection[0] if len(selection) > 0 else None
+        end = selection[1] if len(selection) > 1 else None
+        return start, end
+    return selection, selection
+
+
+def _parse_wide(df, date_columns):
+    """Sum province rows into countries; returns (sorted countries, values)"""
+    codes, countries = pd.factorize(df['Country/Region'], sort=True)
+    values = np.nan_to_num(df[date_columns].to_numpy(dtype='float64'))
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(len(countries)))
+    return pd.Index(countries), np.add.reduceat(values[order], starts, axis=0)
+
+
+def _date_columns(df):
+    return df.columns[len(ID_COLUMNS):]
+
+
+def _source_planes(raw_data, date_columns, countries=None):
+    """(source metric, country, date) array for the given date columns.
+
+    Deaths and recovered are aligned onto the confirmed countries and dates;
+    anything they lack is zero, as the old left merge plus fillna(0) was.
+    """
+    confirmed_countries, confirmed = _parse_wide(raw_data['confirmed'], date_columns)
+    if countries is None:
+        countries = confirmed_countries
+    dates = pd.to_datetime(date_columns, format=DATE_FORMAT)
+    planes = np.zeros((len(SOURCE_METRICS), len(countries), len(dates)))
+    planes[0] = confirmed
+    for i, data_type in enumerate(['deaths', 'recovered'], start=1):
+        if data_type not in raw_data:
+            continue
+        df = raw_data[data_type]
+        columns = [column for column in date_columns if column in df.columns]
+        other_countries, values = _parse_wide(df, columns)
+        planes[i] = (
+            pd.DataFrame(values, index=other_countries, columns=columns)
+            .reindex(index=countries, columns=date_columns, fill_value=0)
+            .to_numpy()
+        )
+    return countries, dates, planes
+
+
+def _region_key(df):
+    return pd.MultiIndex.from_arrays(
+        [df['Country/Region'], df['Province/State'].fillna('')], names=['Country/Region', 'Province/State']
+    )
+
+
+def _region_planes(raw_data, date_columns, regions=None):
+    """(source metric, region, date) array for the given date columns.
+
+    Regions are the confirmed file's rows unless given; rows of the other
+    files are matched on (country, province), and anything missing is zero.
+    """
+    if regions is None:
+        confirmed = raw_data['confirmed']
+        regions = (
+            confirmed[ID_COLUMNS]
+            .assign(**{'Province/State': confirmed['Province/State'].fillna('')})
+            .drop_duplicates(['Country/Region', 'Province/State'])
+            .sort_values(['Country/Region', 'Province/State'], kind='stable')
+        )
+    index = _region_key(regions)
+    dates = pd.to_datetime(date_columns, format=DATE_FORMAT)
+    planes = np.zeros((len(SOURCE_METRICS), len(regions), len(dates)))
+    for i, data_type in enumerate(['confirmed', 'deaths', 'recovered']):
+        if data_type not in raw_data:
+            continue
+        df = raw_data[data_type]
+        columns = [column for column in date_columns if column in df.columns]
+        values = pd.DataFrame(np.nan_to_num(df[columns].to_numpy(dtype='float64')), index=_region_key(df), columns=columns)
+        planes[i] = (
+            values.groupby(level=[0, 1]).sum()
+            .reindex(index=index, columns=date_columns, fill_value=0)
+            .to_numpy()
+        )
+    return regions, dates, planes
+
+
+def _derive(planes):
+    """(int32 counts, float32 rates) arrays from the source metric planes.
+
+    The arithmetic runs in float64 and is narrowed at the end, so daily
+    changes stay exact and the averages differ only by float32 rounding.
+    """
+    planes = np.asarray(planes, dtype='float64')
+    confirmed, deaths, recovered = planes
+    active = np.clip(confirmed - deaths - recovered, 0, None)
+    counts = np.concatenate([planes, active[np.newaxis]]).astype('int32')
+    new = deltas(planes[:2])
+    rates = np.concatenate([new, rolling_mean(new, window=7)]).astype('float32')
+    return counts, rates
+
+
+def derive_metrics(planes, block_rows=None):
+    """_derive over blocks of block_rows rows, so the float64 working copy stays one block"""
+    if block_rows is None:
+        return _derive(planes)
+    n_rows, n_dates = planes.shape[1], planes.shape[2]
+    counts = np.empty((len(COUNT_METRICS), n_rows, n_dates), dtype='int32')
+    rates = np.empty((len(RATE_METRICS), n_rows, n_dates), dtype='float32')
+    for start in range(0, n_rows, block_rows):
+        rows = slice(start, start + block_rows)
+        counts[:, rows], rates[:, rows] = _derive(planes[:, rows])
+    return counts, rates
+
+
+def build_cube(raw_data):
+    """Build a cube from the raw wide frames ({'confirmed': df, ...})"""
+    date_columns = _date_columns(raw_data['confirmed'])
+    with span('aggregate'):
+        countries, dates, planes = _source_planes(raw_data, date_columns)
+        regions, _, region_planes = _region_planes(raw_data, date_columns)
+    with span('derived_metrics'):
+        counts, rates = _derive(planes)
+        region_counts, region_rates = _derive(region_planes)
+    return CovidCube(countries, dates, counts, rates, regions=RegionCube(regions, dates, region_counts, region_rates))
+
+
+def _same_history(df, previous, n_dates):
+    """True if df has the rows of previous and the same values in its first n_dates date columns"""
+    keys = ['Province/State', 'Country/Region']
+    if len(df) != len(previous) or not df[keys].equals(previous[keys]):
+        return False
+    history = slice(len(ID_COLUMNS), len(ID_COLUMNS) + n_dates)
+    return df.iloc[:, history].equals(previous.iloc[:, history])
+
+
+def extend_cube(cube, raw_data, previous):
+    """Append the date columns added since the raw frames previous were processed.
+
+    cube must have been built from previous. Only the new columns are parsed;
+    the last SEED_DAYS of the cube seed their diffs and moving averages. The
+    old columns are compared value for value with previous, nothing is
+    hashed. Returns None when the history itself changed (revised counts,
+    new regions, different columns), in which case the caller has to rebuild.
+    """
+    if cube is None or set(raw_data) != set(previous):
+        return None
+
+    old_columns = _date_columns(previous['confirmed'])
+    all_columns = _date_columns(raw_data['confirmed'])
+    if len(old_columns) != len(cube.dates) or not all_columns[:len(old_columns)].equals(old_columns):
+        return None
+    for data_type, df in raw_data.items():
+        old = previous[data_type]
+        if not _date_columns(old).equals(old_columns) or not _date_columns(df).equals(all_columns):
+            return None
+        # An unchanged file is handed back as the same frame by parse_covid_data
+        if df is not old and not _same_history(df, old, len(old_columns)):
+            return None
+
+    new_columns = all_columns[len(old_columns):]
+    if len(new_columns) == 0:
+        return cube
+
+    if cube.regions is None:
+        return None
+
+    with span('aggregate'):
+        _, new_dates, new_planes = _source_planes(raw_data, new_columns, countries=cube.countries)
+        _, _, new_region_planes = _region_planes(raw_data, new_columns, regions=cube.regions.regions)
+    with span('derived_metrics'):
+        counts, rates = _extend_planes(cube.counts, cube.rates, new_planes)
+        region_counts, region_rates = _extend_planes(cube.regions.counts, cube.regions.rates, new_region_planes)
+    dates = cube.dates.append(new_dates)
+    return CovidCube(
+        cube.countries, dates, counts, rates,
+        regions=RegionCube(cube.regions.regions, dates, region_counts, region_rates)
+    )
+
+
+def _extend_planes(counts, rates, new_planes):
+    """Append derived metrics for new source planes, seeded by the last SEED_DAYS"""
+    source = counts[:len(SOURCE_METRICS), :, -SEED_DAYS:]
+    seeded = source.shape[2]
+    new_counts, new_rates = _derive(np.concatenate([source, new_planes], axis=2))
+    return (
+        np.concatenate([counts, new_counts[:, :, seeded:]], axis=2),
+        np.concatenate([rates, new_rates[:, :, seeded:]], axis=2)
+    )
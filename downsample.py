@@ -0,0 +1,78 @@
+"""Shape-preserving downsampling of time series before they go to the browser.
+
+Uses Largest-Triangle-Three-Buckets: the series is split into equal buckets
+and each bucket keeps the point forming the largest triangle with the point
+kept before it and the mean of the next bucket. Every row of a cube plane
+shares the date axis, so all countries are sampled together, one bucket at
+a time.
+"""
+import numpy as np
+
+DEFAULT_CHART_WIDTH = 1200  # px, a full-width chart in the wide layout
+POINTS_PER_PIXEL = 0.5
+
+
+def points_for_width(width=DEFAULT_CHART_WIDTH, points_per_pixel=POINTS_PER_PIXEL):
+    """Point budget per trace for a chart `width` pixels wide"""
+    return max(int(width * points_per_pixel), 3)
+
+
+def lttb_indices(values, n_out):
+    """(series, n_out) positions LTTB keeps for each row of values.
+
+    values is (series, points) on a shared, evenly spaced x axis. The first
+    and last points are always kept.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype='float64'))
+    n_series, n_points = values.shape
+    if n_out >= n_points or n_out < 3:
+        return np.tile(np.arange(n_points), (n_series, 1))
+
+    x = np.arange(n_points, dtype='float64')
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(np.intp)
+    kept = np.empty((n_series, n_out), dtype=np.intp)
+    kept[:, 0] = 0
+    kept[:, -1] = n_points - 1
+    rows = np.arange(n_series)
+    previous = np.zeros(n_series, dtype=np.intp)
+
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo = hi
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else n_points
+        next_x = x[next_lo:next_hi].mean()
+        next_y = values[:, next_lo:next_hi].mean(axis=1)
+        prev_x = x[previous]
+        prev_y = values[rows, previous]
+        area = np.abs(
+            (prev_x - next_x)[:, np.newaxis] * (values[:, lo:hi] - prev_y[:, np.newaxis])
+            - (prev_x[:, np.newaxis] - x[lo:hi]) * (next_y - prev_y)[:, np.newaxis]
+        )
+        previous = lo + area.argmax(axis=1)
+        kept[:, bucket + 1] = previous
+    return kept
+
+
+def downsample_indices(values, max_points=None):
+    """Sorted positions to plot for each row of values, at most max_points each.
+
+    Each row keeps its LTTB sample plus its peak and its most recent value.
+    With max_points None, or a series already short enough, every position
+    is kept. Returns a list with one index array per row.
+    """
+    if max_points is not None and max_points < 2:
+        raise ValueError(f"max_points must be at least 2 (the peak and the last value), not {max_points}")
+    values = np.atleast_2d(np.asarray(values, dtype='float64'))
+    n_series, n_points = values.shape
+    if max_points is None or n_points <= max_points:
+        return [np.arange(n_points)] * n_series
+
+    if max_points >= 4:
+        # One slot of the budget is held back for the peak
+        sampled = lttb_indices(values, max_points - 1)
+    else:
+        # Too small for LTTB: the first point if there is room, beside the peak and the last
+        sampled = np.zeros((n_series, max_points - 2), dtype=np.intp)
+    peaks = np.where(np.isnan(values), -np.inf, values).argmax(axis=1)
+    return [np.union1d(row, [peak, n_points - 1]) for row, peak in zip(sampled, peaks)]
@@ -0,0 +1,66 @@
+"""Chunked CSV, gzip CSV and Parquet export of a cube.
+
+Rows are produced a batch of countries at a time and written straight to
+the output file, so the long table and its text never exist in memory all
+at once, however large the selection.
+"""
+import gzip
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cube import COUNT_METRICS, RATE_METRICS
+
+# label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet')
+}
+CHUNK_COUNTRIES = 32
+
+PARQUET_SCHEMA = pa.schema(
+    [('Country/Region', pa.string()), ('Date', pa.timestamp('ns'))]
+    + [(metric, pa.int32()) for metric in COUNT_METRICS]
+    + [(metric, pa.float32()) for metric in RATE_METRICS]
+)
+
+
+def iter_frames(cube, chunk_countries=CHUNK_COUNTRIES):
+    """Long frames (see CovidCube.to_frame) for successive batches of countries"""
+    for start in range(0, len(cube.countries), chunk_countries):
+        yield cube.select(cube.countries[start:start + chunk_countries]).to_frame()
+
+
+def _write_csv(cube, fileobj, chunk_countries):
+    header = True
+    for frame in iter_frames(cube, chunk_countries):
+        fileobj.write(frame.to_csv(index=False, header=header).encode('utf-8'))
+        header = False
+    if header:
+        fileobj.write((','.join(['Country/Region', 'Date', *cube.metrics]) + '\n').encode('utf-8'))
+
+
+def write_export(cube, fileobj, fmt='CSV', chunk_countries=CHUNK_COUNTRIES):
+    """Write cube in one of EXPORT_FORMATS to a binary file object"""
+    if fmt == 'CSV':
+        _write_csv(cube, fileobj, chunk_countries)
+    elif fmt == 'CSV (gzip)':
+        with gzip.GzipFile(fileobj=fileobj, mode='wb') as compressed:
+            _write_csv(cube, compressed, chunk_countries)
+    elif fmt == 'Parquet':
+        with pq.ParquetWriter(fileobj, PARQUET_SCHEMA, compression='zstd') as writer:
+            for frame in iter_frames(cube, chunk_countries):
+                frame['Country/Region'] = frame['Country/Region'].astype(str)
+                writer.write_table(pa.Table.from_pandas(frame, schema=PARQUET_SCHEMA, preserve_index=False))
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_file(cube, fmt='CSV', chunk_countries=CHUNK_COUNTRIES):
+    """Export to an anonymous temporary file, rewound and ready to read"""
+    fileobj = tempfile.TemporaryFile()
+    write_export(cube, fileobj, fmt, chunk_countries)
+    fileobj.seek(0)
+    return fileobj
@@ -0,0 +1,224 @@
+"""Concurrent download of the JHU CSSE time-series CSVs"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Point at a LocalMirrorServer (or any mirror) for offline runs
+JHU_BASE_URL = os.environ.get(
+    "JHU_BASE_URL",
+    "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series"
+)
+
+JHU_FILES = {
+    'confirmed': "time_series_covid19_confirmed_global.csv",
+    'deaths': "time_series_covid19_deaths_global.csv",
+    'recovered': "time_series_covid19_recovered_global.csv"
+}
+
+
+def jhu_urls(base_url=None, files=None):
+    """Map each data type to its time-series URL under base_url"""
+    base_url = (base_url or JHU_BASE_URL).rstrip('/')
+    return {data_type: f"{base_url}/{filename}" for data_type, filename in (files or JHU_FILES).items()}
+
+
+def content_digest(content):
+    """Digest of a downloaded file, computed once when its bytes arrive"""
+    return hashlib.sha1(content).hexdigest()
+
+
+class FetchError(Exception):
+    """Raised when one of the time-series files could not be downloaded"""
+
+    def __init__(self, data_type, error):
+        super().__init__(f"{data_type}: {error}")
+        self.data_type = data_type
+        self.error = error
+
+
+@dataclass
+class FetchResult:
+    data_type: str
+    url: str
+    content: bytes
+    status: int
+    elapsed: float
+    not_modified: bool
+    digest: str
+
+
+class JHUFetcher:
+    """Downloads a set of CSVs in parallel over one pooled session.
+
+    ETag/Last-Modified validators and the last body are kept per URL, so a
+    repeat fetch of an unchanged file costs a 304 and no payload.
+    """
+
+    def __init__(self, urls, timeout=10, max_workers=None):
+        self.urls = dict(urls)
+        self.timeout = timeout
+        self.max_workers = max_workers or len(self.urls)
+        self._session = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='jhu-fetch')
+        self._lock = threading.Lock()
+        self._cached = {}
+
+    @property
+    def session(self):
+        """Pooled session, created on first use so requests is only imported to fetch"""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _conditional_headers(self, url):
+        with self._lock:
+            cached = self._cached.get(url)
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def fetch_one(self, data_type, url):
+        """Fetch a single file, reusing the cached body on a 304"""
+        started = time.perf_counter()
+        response = self.session.get(url, headers=self._conditional_headers(url), timeout=self.timeout)
+        if response.status_code == 304:
+            with self._lock:
+                cached = self._cached[url]
+            return FetchResult(
+                data_type, url, cached['content'], 304, time.perf_counter() - started, True, cached['digest']
+            )
+
+        response.raise_for_status()
+        content = response.content
+        digest = content_digest(content)
+        with self._lock:
+            self._cached[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'content': content,
+                'digest': digest
+            }
+        return FetchResult(
+            data_type, url, content, response.status_code, time.perf_counter() - started, False, digest
+        )
+
+    def fetch_all(self):
+        """Fetch every configured file concurrently; returns {data_type: FetchResult}"""
+        futures = {
+            data_type: self._executor.submit(self.fetch_one, data_type, url)
+            for data_type, url in self.urls.items()
+        }
+        results = {}
+        for data_type, future in futures.items():
+            try:
+                results[data_type] = future.result()
+            except Exception as e:
+                raise FetchError(data_type, e) from e
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+
+class LocalMirrorServer:
+    """In-process HTTP stand-in for the JHU raw file host.
+
+    Serves {filename: bytes} with ETag and Last-Modified headers and answers
+    conditional requests with 304, so the fetch layer can run offline:
+
+        with LocalMirrorServer({'a.csv': b'...'}) as server:
+            JHUFetcher(jhu_urls(server.base_url)).fetch_all()
+    """
+
+    def __init__(self, files=None, host='127.0.0.1', port=0):
+        self.files = {}
+        self.requests = []
+        for filename, content in (files or {}).items():
+            self.put(filename, content)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def put(self, filename, content):
+        """Add or replace a served file; a new body gets a new ETag"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        self.files[filename] = {
+            'content': content,
+            'etag': '"' + hashlib.sha1(content).hexdigest() + '"',
+            'last_modified': formatdate(time.time(), usegmt=True)
+        }
+
+    def _make_handler(self):
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                filename = self.path.rsplit('/', 1)[-1]
+                entry = mirror.files.get(filename)
+                if entry is None:
+                    mirror.requests.append((filename, 404))
+                    self.send_error(404)
+                    return
+
+                not_modified = (
+                    self.headers.get('If-None-Match') == entry['etag']
+                    or (self.headers.get('If-None-Match') is None
+                        and self.headers.get('If-Modified-Since') == entry['last_modified'])
+                )
+                status = 304 if not_modified else 200
+                mirror.requests.append((filename, status))
+                self.send_response(status)
+                self.send_header('ETag', entry['etag'])
+                self.send_header('Last-Modified', entry['last_modified'])
+                if not_modified:
+                    self.end_headers()
+                    return
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(entry['content'])))
+                self.end_headers()
+                self.wfile.write(entry['content'])
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,156 @@
+"""Named timing spans with optional peak-allocation tracking.
+
+    with span('parse'):
+        raw_data = parse_covid_data(results)
+
+COVID_INSTRUMENT selects what is recorded: 'off' (span() returns a shared
+no-op context manager), 'time' (wall time only, the default) or 'memory'
+(wall time plus peak Python allocation through tracemalloc, which slows
+allocation-heavy code noticeably). Each stage keeps a rolling history of
+its last runs, and with COVID_SPAN_LOG set every span is also appended to
+that file as one JSON object per line.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timezone
+
+MODES = ('off', 'time', 'memory')
+HISTORY = 50
+_DISABLED = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'started', 'start_bytes', 'peak_bytes')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.recorder._enter(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        self.recorder._exit(self, seconds, exc_type is None)
+        return False
+
+
+class SpanRecorder:
+    """Rolling per-stage history of span durations (and peak allocations).
+
+    Peaks are tracked with tracemalloc, which is process-wide: a span's
+    peak is the highest traced memory above its starting point, so spans
+    running at the same time on other threads count towards it.
+    """
+
+    def __init__(self, mode='time', history=HISTORY, log_path=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown instrumentation mode: {mode}")
+        self.mode = mode
+        self.history = history
+        self.log_path = log_path
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if mode == 'memory' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get("COVID_INSTRUMENT", "time"),
+            int(os.environ.get("COVID_SPAN_HISTORY", HISTORY)),
+            os.environ.get("COVID_SPAN_LOG") or None
+        )
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def span(self, name):
+        """Context manager timing one run of stage `name`"""
+        if self.mode == 'off':
+            return _DISABLED
+        return _Span(self, name)
+
+    def _open_spans(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _fold_peak(self, stack):
+        # reset_peak is global, so fold the peak so far into every open span first
+        current, peak = tracemalloc.get_traced_memory()
+        for open_span in stack:
+            open_span.peak_bytes = max(open_span.peak_bytes, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _enter(self, span):
+        if self.mode == 'memory' and tracemalloc.is_tracing():
+            stack = self._open_spans()
+            span.start_bytes = span.peak_bytes = self._fold_peak(stack)
+            stack.append(span)
+        else:
+            span.start_bytes = None
+
+    def _exit(self, span, seconds, ok):
+        peak = None
+        if span.start_bytes is not None:
+            stack = self._open_spans()
+            self._fold_peak(stack)
+            stack.remove(span)
+            peak = span.peak_bytes - span.start_bytes
+        self.record(span.name, seconds, peak, ok)
+
+    def record(self, stage, seconds, peak_bytes=None, ok=True):
+        entry = {
+            'stage': stage,
+            'at': datetime.now(timezone.utc).isoformat(),
+            'seconds': seconds,
+            'peak_bytes': peak_bytes,
+            'ok': ok,
+            'thread': threading.current_thread().name
+        }
+        with self._lock:
+            runs = self._stages.get(stage)
+            if runs is None:
+                runs = self._stages[stage] = deque(maxlen=self.history)
+            runs.append(entry)
+            if self.log_path:
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+
+    def runs(self, stage):
+        with self._lock:
+            return list(self._stages.get(stage, ()))
+
+    def summary(self):
+        """One row per stage over its retained history, in first-seen order"""
+        with self._lock:
+            stages = {stage: list(runs) for stage, runs in self._stages.items()}
+        rows = []
+        for stage, runs in stages.items():
+            seconds = [run['seconds'] for run in runs]
+            peaks = [run['peak_bytes'] for run in runs if run['peak_bytes'] is not None]
+            rows.append({
+                'stage': stage,
+                'runs': len(runs),
+                'last_ms': seconds[-1] * 1000,
+                'mean_ms': sum(seconds) / len(seconds) * 1000,
+                'max_ms': max(seconds) * 1000,
+                'peak_mb': max(peaks) / 1024**2 if peaks else None
+            })
+        return rows
+
+
+recorder = SpanRecorder.from_env()
+span = recorder.span
@@ -0,0 +1,94 @@
+"""Size-bounded cache of rendered chart images and query responses"""
+import io
+import threading
+from collections import OrderedDict
+
+# Same settings st.pyplot uses, so a cached PNG looks like a live render
+SAVEFIG_KWARGS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+# st.image scales anything wider than this down on every call; do it once here instead
+MAX_IMAGE_WIDTH = 2 * 730
+
+
+def figure_png(fig):
+    """Rasterize a matplotlib figure to PNG bytes and close it"""
+    if fig is None:
+        return None
+    import matplotlib.pyplot as plt
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, **SAVEFIG_KWARGS)
+    finally:
+        plt.close(fig)
+
+    image = Image.open(buffer)
+    if image.width <= MAX_IMAGE_WIDTH:
+        return buffer.getvalue()
+    height = int(image.height * MAX_IMAGE_WIDTH / image.width)
+    resized = io.BytesIO()
+    image.resize((MAX_IMAGE_WIDTH, height), resample=Image.BILINEAR).save(resized, format='PNG')
+    return resized.getvalue()
+
+
+class RenderCache:
+    """LRU of rendered bytes (PNGs, API responses) bounded by their total size.
+
+    Keys should capture everything the image depends on, e.g.
+    (data version, chart type, countries, date range).
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= len(previous)
+            self._entries[key] = png
+            self.nbytes += len(png)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+
+    def get_or_render(self, key, render):
+        """Cached PNG for key, or render() it and keep the result unless it is None"""
+        png = self.get(key)
+        if png is None:
+            png = render()
+            if png is not None:
+                self.put(key, png)
+        return png
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,251 @@
+"""Per-country HTML/PNG summary reports, rendered in a process pool.
+
+Each report has the line, heatmap and bar charts of create_seaborn_plots
+for one country, plus its latest counts and risk metrics, and an index
+page ranks every country in the batch by incidence. Workers never fetch
+or parse anything: each one memory-maps the processed cube from the
+ProcessedStore entry of the current data version once, when it starts,
+so the OS shares those pages between all of them, and the population
+join and peer ranking are also done once per worker rather than per
+country. Charts are drawn with the Agg backend.
+
+    python reports.py --output reports/ --countries Germany Italy --workers 8
+"""
+import argparse
+import html
+import io
+import math
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+REPORT_DPI = 100
+# Countries with the most confirmed cases shown beside each report's country in the heatmap and bar chart
+REPORT_PEERS = 9
+CHARTS = {
+    'line': "Line Plot - Cases Over Time",
+    'heatmap': "Heatmap - Regional Comparison",
+    'bar': "Bar Chart - Current Status"
+}
+
+_worker = {}
+
+
+def report_slug(country):
+    """File-name-safe form of a country name"""
+    return re.sub(r'[^A-Za-z0-9]+', '_', country).strip('_') or 'country'
+
+
+def check_range(cube, start=None, end=None):
+    """Raise ValueError unless cube has at least one date in start..end"""
+    if len(cube.dates) == 0:
+        raise ValueError("the dataset has no dates")
+    if len(cube.between(start, end).dates) == 0:
+        raise ValueError(
+            f"no data between {start or 'the first date'} and {end or 'the last date'}; "
+            f"the dataset covers {cube.dates[0]:%Y-%m-%d} to {cube.dates[-1]:%Y-%m-%d}"
+        )
+
+
+def _init_worker(store_root, key, start, end, population_path):
+    import matplotlib
+
+    matplotlib.use('Agg')
+
+    from risk import RiskMetrics, load_population
+    from store import ProcessedStore
+
+    cube = ProcessedStore(store_root).load(key)
+    if cube is None:
+        raise RuntimeError(f"Processed data {key} is not in {store_root}")
+    cube = cube.between(start, end)
+    _worker['cube'] = cube
+    _worker['risk'] = RiskMetrics.from_cube(cube, load_population(population_path))
+    _worker['peers'] = list(cube.latest().nlargest(REPORT_PEERS, 'Confirmed')['Country/Region'])
+
+
+def _render_country(country, output_dir):
+    """Write one country's charts and HTML page; returns its index row"""
+    import matplotlib.pyplot as plt
+
+    from charts import create_seaborn_plots
+    from risk import RISK_LEVELS
+
+    cube, risk = _worker['cube'], _worker['risk']
+    slug = report_slug(country)
+    peers = [country] + [peer for peer in _worker['peers'] if peer != country]
+    charts = {}
+    for name, plot_type in CHARTS.items():
+        selected = [country] if name == 'line' else peers
+        fig = create_seaborn_plots(cube.select(selected), selected, plot_type)
+        if fig is None:
+            continue
+        charts[name] = f"{slug}_{name}.png"
+        try:
+            fig.savefig(os.path.join(output_dir, charts[name]), dpi=REPORT_DPI, bbox_inches='tight')
+        finally:
+            plt.close(fig)
+
+    latest = cube.select([country]).latest().iloc[0]
+    row = risk.country_index[country]
+    tier = int(risk.tiers[row, -1])
+    population = risk.population[row]
+    summary = {
+        'country': country,
+        'page': f"{slug}.html",
+        'date': cube.dates[-1].strftime('%Y-%m-%d'),
+        'confirmed': int(latest['Confirmed']),
+        'deaths': int(latest['Deaths']),
+        'recovered': int(latest['Recovered']),
+        'active': int(latest['Active']),
+        'new_cases_7ma': float(latest['New_Cases_7MA']),
+        'fatality_rate': latest['Deaths'] / latest['Confirmed'] * 100 if latest['Confirmed'] > 0 else 0.0,
+        'population': None if math.isnan(population) else int(population),
+        'incidence_100k': float(risk.incidence[row, -1]),
+        'risk': RISK_LEVELS[tier][0],
+        'risk_color': RISK_LEVELS[tier][1]
+    }
+    with open(os.path.join(output_dir, summary['page']), 'w', encoding='utf-8') as f:
+        f.write(_country_page(summary, charts))
+    return summary
+
+
+def _format_incidence(value):
+    return "n/a" if math.isnan(value) else f"{value:,.1f}"
+
+
+_STYLE = """
+body { font-family: Inter, Arial, sans-serif; color: #1f2937; margin: 2rem; }
+table { border-collapse: collapse; }
+td, th { padding: 0.35rem 0.9rem; border-bottom: 1px solid #e5e7eb; text-align: left; }
+.badge { padding: 0.2rem 0.6rem; border-radius: 999px; color: white; font-weight: 600; }
+img { max-width: 100%; margin: 1rem 0; }
+"""
+
+
+def _country_page(summary, charts):
+    name = html.escape(summary['country'])
+    population = f"{summary['population']:,}" if summary['population'] is not None else "n/a"
+    metrics = [
+        ("Confirmed", f"{summary['confirmed']:,}"),
+        ("Deaths", f"{summary['deaths']:,}"),
+        ("Recovered", f"{summary['recovered']:,}"),
+        ("Active", f"{summary['active']:,}"),
+        ("New cases/day (7-day MA)", f"{summary['new_cases_7ma']:,.1f}"),
+        ("Fatality rate", f"{summary['fatality_rate']:.2f}%"),
+        ("Population", population),
+        ("New cases per 100k (7 days)", _format_incidence(summary['incidence_100k']))
+    ]
+    rows = "\n".join(f"<tr><th>{label}</th><td>{value}</td></tr>" for label, value in metrics)
+    images = "\n".join(f'<img src="{html.escape(path)}" alt="{name} {chart}">' for chart, path in charts.items())
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>COVID-19 Report: {name}</title><style>{_STYLE}</style></head>
+<body>
+<p><a href="index.html">&larr; All countries</a></p>
+<h1>{name}</h1>
+<p>Data as of {summary['date']} &middot; Risk:
+<span class="badge" style="background: {summary['risk_color']}">{summary['risk']}</span></p>
+<table>
+{rows}
+</table>
+{images}
+</body></html>
+"""
+
+
+def _index_page(summaries):
+    rows = "\n".join(
+        f'<tr><td>{rank}</td><td><a href="{html.escape(s["page"])}">{html.escape(s["country"])}</a></td>'
+        f'<td><span class="badge" style="background: {s["risk_color"]}">{s["risk"]}</span></td>'
+        f'<td>{_format_incidence(s["incidence_100k"])}</td><td>{s["confirmed"]:,}</td><td>{s["deaths"]:,}</td></tr>'
+        for rank, s in enumerate(summaries, 1)
+    )
+    date = summaries[0]['date'] if summaries else ""
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>COVID-19 Summary Reports</title><style>{_STYLE}</style></head>
+<body>
+<h1>COVID-19 Summary Reports</h1>
+<p>Data as of {date}, ranked by new cases per 100k over 7 days.</p>
+<table>
+<tr><th>#</th><th>Country</th><th>Risk</th><th>Cases/100k (7d)</th><th>Confirmed</th><th>Deaths</th></tr>
+{rows}
+</table>
+</body></html>
+"""
+
+
+def generate_reports(store, key, countries, output_dir, workers=None, start=None, end=None, population_path=None):
+    """Render reports for countries into output_dir; returns their index rows, highest incidence first.
+
+    The cube for key must already be saved in store: workers load it from
+    there, not from the caller. Raises ValueError, before any worker starts,
+    if it has no dates between start and end.
+    """
+    cube = store.load(key)
+    if cube is None:
+        raise RuntimeError(f"Processed data {key} is not in {store.root}")
+    check_range(cube, start, end)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(countries) or 1))
+    # spawn, not fork: the dashboard process has server threads a forked child must not inherit
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(str(store.root), key, start, end, population_path)
+    ) as pool:
+        chunksize = max(1, len(countries) // (workers * 4))
+        summaries = list(pool.map(_render_country, countries, [output_dir] * len(countries), chunksize=chunksize))
+
+    summaries.sort(key=lambda s: (math.isnan(s['incidence_100k']), -s['incidence_100k']))
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(_index_page(summaries))
+    return summaries
+
+
+def zip_reports(output_dir):
+    """Zip archive of a report directory, as bytes"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in sorted(os.listdir(output_dir)):
+            archive.write(os.path.join(output_dir, name), name)
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    from service import DataService
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', required=True, help='directory for the HTML pages and PNG charts')
+    parser.add_argument('--countries', nargs='+', help='countries to report on (default: all)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--source', help='URL, directory or tarball of the JHU files (default: COVID_DATA_SOURCE)')
+    parser.add_argument('--start', help='first date to include, YYYY-MM-DD')
+    parser.add_argument('--end', help='last date to include, YYYY-MM-DD')
+    args = parser.parse_args(argv)
+
+    service = DataService.default(args.source)
+    service.restore()
+    version = service.refresh()
+    countries = args.countries or list(version.cube.countries)
+    missing = [country for country in countries if country not in version.cube]
+    if missing:
+        parser.error(f"unknown countries: {', '.join(missing)}")
+    try:
+        check_range(version.cube, args.start, args.end)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    service.persist()
+    summaries = generate_reports(service.store, version.key, countries, args.output, args.workers, args.start, args.end)
+    print(f"{len(summaries)} reports written to {args.output} in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
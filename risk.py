@@ -0,0 +1,101 @@
+"""Per-capita incidence and risk tiers for every country and date at once.
+
+Incidence is new cases over the last 7 days per 100,000 people: the 7-day
+moving average of new cases times seven, over the population from the
+bundled table (data/population.csv, 2020 mid-year estimates keyed by JHU
+country name). The population is joined onto the cube's countries once,
+when a dataset is published; the tiers then come from one searchsorted
+over the whole (country, date) incidence plane.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+POPULATION_PATH = os.environ.get(
+    "COVID_POPULATION_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "population.csv")
+)
+PER_CAPITA = 100_000
+INCIDENCE_DAYS = 7
+
+# Tier i covers incidence above RISK_THRESHOLDS[i - 1] up to RISK_THRESHOLDS[i]
+RISK_THRESHOLDS = np.array([25.0, 100.0])
+# tier -> (label, colour, badge CSS class); -1 is a country without a population
+RISK_LEVELS = {
+    -1: ("Unknown", "#9ca3af", "risk-unknown"),
+    0: ("Low", "#10b981", "risk-low"),
+    1: ("Medium", "#f59e0b", "risk-medium"),
+    2: ("High", "#ef4444", "risk-high")
+}
+
+
+def load_population(path=None):
+    """Population per Country/Region from the bundled table"""
+    table = pd.read_csv(path or POPULATION_PATH)
+    return table.set_index('Country/Region')['Population']
+
+
+def classify(incidence):
+    """int8 tier of every incidence value; NaN (no population) is -1"""
+    tiers = np.searchsorted(RISK_THRESHOLDS, incidence, side='left').astype('int8')
+    tiers[np.isnan(incidence)] = -1
+    return tiers
+
+
+class RiskMetrics:
+    """Incidence per 100k and risk tier as (country, date) planes aligned with a cube"""
+
+    def __init__(self, countries, dates, population, incidence, tiers=None):
+        self.countries = pd.Index(countries)
+        self.dates = pd.DatetimeIndex(dates)
+        self.population = population
+        self.incidence = incidence
+        self.tiers = classify(incidence) if tiers is None else tiers
+        self.country_index = {country: i for i, country in enumerate(self.countries)}
+
+    @classmethod
+    def from_cube(cls, cube, population):
+        """Join population onto the cube's countries and compute every date in one pass"""
+        population = np.array(population.reindex(cube.countries), dtype='float64')
+        population[population <= 0] = np.nan
+        with np.errstate(invalid='ignore'):
+            incidence = cube['New_Cases_7MA'] * (INCIDENCE_DAYS * PER_CAPITA / population[:, np.newaxis])
+        return cls(cube.countries, cube.dates, population, incidence.astype('float32'))
+
+    def __contains__(self, country):
+        return country in self.country_index
+
+    @property
+    def nbytes(self):
+        return self.population.nbytes + self.incidence.nbytes + self.tiers.nbytes
+
+    def select(self, countries):
+        """Metrics restricted to the given countries, in the order given"""
+        countries = [country for country in countries if country in self.country_index]
+        rows = [self.country_index[country] for country in countries]
+        return RiskMetrics(countries, self.dates, self.population[rows], self.incidence[rows], self.tiers[rows])
+
+    def between(self, start=None, end=None):
+        """Metrics restricted to start <= date <= end (a view, as CovidCube.between)"""
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        return RiskMetrics(
+            self.countries, self.dates[lo:hi], self.population, self.incidence[:, lo:hi], self.tiers[:, lo:hi]
+        )
+
+    def ranking(self):
+        """One row per country on the last date, highest incidence first"""
+        if len(self.dates) == 0:
+            return pd.DataFrame(columns=['Country/Region', 'Population', 'Incidence_100k', 'Tier', 'Risk'])
+        tiers = self.tiers[:, -1]
+        frame = pd.DataFrame({
+            'Country/Region': self.countries,
+            'Population': pd.array(self.population, dtype='Int64'),
+            'Incidence_100k': self.incidence[:, -1],
+            'Tier': tiers,
+            'Risk': pd.Categorical.from_codes(
+                tiers + 1, categories=[RISK_LEVELS[tier][0] for tier in sorted(RISK_LEVELS)]
+            )
+        })
+        return frame.sort_values('Incidence_100k', ascending=False, na_position='last', ignore_index=True)
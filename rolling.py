@@ -0,0 +1,40 @@
+"""Daily deltas and trailing-window means along the date axis.
+
+Every function works on the last axis of an array of any shape, so a whole
+(metric, country, date) block is handled in one call: each country's
+history is one contiguous run and no grouping is needed.
+"""
+import numpy as np
+
+MA_WINDOWS = (7, 14, 28)
+
+
+def deltas(values):
+    """Day-over-day change; the first day is 0, as groupby().diff().fillna(0) gave"""
+    values = np.asarray(values, dtype='float64')
+    return np.diff(values, axis=-1, prepend=values[..., :1])
+
+
+def rolling_means(values, windows=MA_WINDOWS):
+    """Trailing means for each window, as rolling(window, min_periods=1).mean().
+
+    Uses one cumulative sum for all windows: the sum over a window is the
+    difference of two prefix sums, and the first window-1 days are divided
+    by the number of days seen so far. Returns {window: array}.
+    """
+    values = np.asarray(values, dtype='float64')
+    n_dates = values.shape[-1]
+    prefix = np.cumsum(values, axis=-1)
+    seen = np.arange(1, n_dates + 1, dtype='float64')
+
+    means = {}
+    for window in windows:
+        sums = prefix.copy()
+        sums[..., window:] -= prefix[..., :-window]
+        means[window] = sums / np.minimum(seen, window)
+    return means
+
+
+def rolling_mean(values, window=7):
+    """Trailing mean for a single window"""
+    return rolling_means(values, (window,))[window]
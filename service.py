@@ -0,0 +1,220 @@
+"""Process-wide COVID-19 dataset shared by every dashboard session"""
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from cube import CovidCube, build_cube, extend_cube
+from instrument import span
+from risk import RiskMetrics, load_population
+from sources import open_source
+from store import ProcessedStore, source_key
+from us_counties import US_FILES, build_us
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = int(os.environ.get("COVID_REFRESH_SECONDS", 3600))
+RETAINED_VERSIONS = int(os.environ.get("COVID_RETAINED_VERSIONS", 3))
+
+
+def parse_covid_data(results, parsed=None):
+    """Parse fetched files ({data_type: FetchResult}) into raw wide frames
+
+    parsed maps data types to the (digest, frame) pairs of an earlier call;
+    a file with the same fetch digest is not parsed again.
+    """
+    parsed = parsed or {}
+    raw_data = {}
+    for data_type, result in results.items():
+        previous = parsed.get(data_type)
+        if previous is not None and previous[0] == result.digest:
+            raw_data[data_type] = previous[1]
+        else:
+            # copy() consolidates the one-block-per-column frame read_csv returns,
+            # so the date columns come out as a single array
+            raw_data[data_type] = pd.read_csv(io.BytesIO(result.content)).copy()
+    return raw_data
+
+
+def process_covid_data(raw_data, previous=None):
+    """Process the raw wide frames into a country x date cube
+
+    previous is an optional (cube, raw_data) pair from the last load. When
+    the new files only append date columns to it, just those days are
+    processed; the result is the same as a full rebuild.
+    """
+    if not raw_data:
+        return None
+
+    if previous is not None:
+        previous_cube, previous_raw = previous
+        extended = extend_cube(previous_cube, raw_data, previous_raw)
+        if extended is not None:
+            return extended
+
+    return build_cube(raw_data)
+
+
+def load_us_data(source=None):
+    """Fetch and build the US county, state and national rollups (see us_counties)"""
+    source = source or open_source(files=US_FILES)
+    try:
+        with span('us:download'):
+            results = source.fetch_all()
+    finally:
+        source.close()
+    return build_us(results)
+
+
+@dataclass(frozen=True)
+class DataVersion:
+    """One published dataset; its arrays are read-only"""
+    number: int
+    key: str
+    cube: CovidCube
+    risk: RiskMetrics
+    published_at: datetime
+
+
+class DataService:
+    """Loads the dataset once per process and refreshes it on a schedule.
+
+    Readers take `current` once per rerun and keep that DataVersion for the
+    whole run; a refresh builds the next version off to the side and swaps
+    the reference in one assignment, so no reader sees a half-built dataset.
+
+    Processed cubes are keyed by source_key of the fetch digests. The last
+    `retain` of them stay in memory and are handed back as the same object,
+    and the store keeps them on disk across restarts.
+    """
+
+    def __init__(self, source, store, interval=REFRESH_SECONDS, retain=RETAINED_VERSIONS, population=None):
+        self.source = source
+        self.store = store
+        self.population = load_population() if population is None else population
+        self.interval = interval
+        self.retain = retain
+        self.last_refresh = None
+        self.last_fetch = {}
+        self.last_error = None
+        self._version = None
+        self._parsed = {}
+        self._cubes = OrderedDict()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def default(cls, location=None):
+        return cls(open_source(location), ProcessedStore(max_entries=RETAINED_VERSIONS))
+
+    @property
+    def current(self):
+        """The latest published DataVersion, or None before the first load"""
+        return self._version
+
+    def _publish(self, key, cube):
+        cube.counts.flags.writeable = False
+        cube.rates.flags.writeable = False
+        if cube.regions is not None:
+            cube.regions.counts.flags.writeable = False
+            cube.regions.rates.flags.writeable = False
+        with span('risk'):
+            risk = RiskMetrics.from_cube(cube, self.population)
+        risk.incidence.flags.writeable = False
+        risk.tiers.flags.writeable = False
+        number = self._version.number + 1 if self._version is not None else 1
+        self._version = DataVersion(number, key, cube, risk, datetime.now(timezone.utc))
+        self._cubes[key] = cube
+        self._cubes.move_to_end(key)
+        while len(self._cubes) > self.retain:
+            self._cubes.popitem(last=False)
+        return self._version
+
+    def _cached(self, key):
+        """Processed cube for a source key from memory or the store, or None"""
+        cube = self._cubes.get(key)
+        if cube is None:
+            cube = self.store.load(key)
+        return cube
+
+    def restore(self):
+        """Publish the newest dataset from the on-disk store, if there is one"""
+        cached = self.store.latest()
+        if cached is not None and self._version is None:
+            self._publish(*cached)
+        return self._version
+
+    def persist(self, version=None):
+        """Make sure a version (the current one by default) is in the store, for readers in other processes"""
+        version = version or self._version
+        if version is not None and not self.store.path(version.key).is_file():
+            self.store.save(version.key, version.cube)
+        return version
+
+    def refresh(self):
+        """Fetch the sources and publish a new version if they changed.
+
+        The cache key comes from the digests the fetch already computed, so
+        an unchanged dataset costs no hashing, parsing or processing. On a
+        change, only files with a new digest are parsed again.
+        """
+        with self._refresh_lock:
+            try:
+                with span('download'):
+                    results = self.source.fetch_all()
+                digests = {data_type: result.digest for data_type, result in results.items()}
+                key = source_key(digests)
+                current = self._version
+                if current is None or current.key != key:
+                    cube = self._cached(key)
+                    if cube is None:
+                        cube, parsed = self._process(results, current)
+                        self.store.save(key, cube)
+                    else:
+                        # No parsed frames stand behind a cached cube; the next change rebuilds in full
+                        parsed = {}
+                    self._publish(key, cube)
+                    # Replaced only once published, so _parsed always holds the frames of the current cube
+                    self._parsed = parsed
+            except Exception as e:
+                self.last_error = e
+                raise
+            self.last_fetch = results
+            self.last_refresh = datetime.now(timezone.utc)
+            self.last_error = None
+            return self._version
+
+    def _process(self, results, current):
+        """(cube, parsed frames) for results; self._parsed is left to refresh to replace"""
+        with span('parse'):
+            raw_data = parse_covid_data(results, self._parsed)
+        previous = None
+        if current is not None and self._parsed:
+            previous = (current.cube, {data_type: df for data_type, (_, df) in self._parsed.items()})
+        cube = process_covid_data(raw_data, previous)
+        return cube, {data_type: (results[data_type].digest, df) for data_type, df in raw_data.items()}
+
+    def _run(self):
+        delay = 0
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Scheduled COVID-19 data refresh failed")
+            delay = self.interval
+
+    def start(self):
+        """Refresh now and then every `interval` seconds in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="covid-data-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
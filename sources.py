@@ -0,0 +1,148 @@
+"""Where the JHU time-series files come from.
+
+A data source has fetch_all() -> {data_type: FetchResult} (raising
+FetchError) and close(). JHUFetcher is the HTTP source; the sources here
+read a local mirror instead, either a directory holding the CSVs or a
+tarball of them, so air-gapped deployments and tests need no network.
+
+Local sources report a file as not_modified when it is unchanged since the
+last fetch: a file whose size and mtime are the same is not read again, and
+one that was rewritten with the same bytes is recognised by its hash. The
+service only re-parses the files that changed.
+"""
+import os
+import tarfile
+import threading
+import time
+
+from fetch import JHU_FILES, FetchError, FetchResult, JHUFetcher, content_digest, jhu_urls
+
+TARBALL_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+class _LocalSource:
+    """Change tracking shared by the local sources"""
+
+    def __init__(self, files=None):
+        self.files = dict(files or JHU_FILES)
+        self._lock = threading.Lock()
+        self._seen = {}  # data_type -> {'stat', 'digest', 'content'}
+
+    def _result(self, data_type, location, stat, read, started):
+        """FetchResult for one file, reading it only if its stat changed"""
+        seen = self._seen.get(data_type)
+        if seen is not None and seen['stat'] == stat:
+            return FetchResult(
+                data_type, location, seen['content'], 304, time.perf_counter() - started, True, seen['digest']
+            )
+
+        content = read()
+        digest = content_digest(content)
+        unchanged = seen is not None and seen['digest'] == digest
+        if unchanged:
+            content = seen['content']
+        self._seen[data_type] = {'stat': stat, 'digest': digest, 'content': content}
+        status = 304 if unchanged else 200
+        return FetchResult(data_type, location, content, status, time.perf_counter() - started, unchanged, digest)
+
+    def close(self):
+        pass
+
+
+class LocalDirectorySource(_LocalSource):
+    """JHU CSVs in a local directory, e.g. a checkout of the COVID-19 repository's time-series folder"""
+
+    def __init__(self, path, files=None):
+        super().__init__(files)
+        self.path = path
+
+    def fetch_all(self):
+        results = {}
+        with self._lock:
+            for data_type, filename in self.files.items():
+                started = time.perf_counter()
+                location = os.path.join(self.path, filename)
+                try:
+                    stat = os.stat(location)
+                    results[data_type] = self._result(
+                        data_type, location, (stat.st_mtime_ns, stat.st_size), lambda: _read(location), started
+                    )
+                except OSError as e:
+                    raise FetchError(data_type, e) from e
+        return results
+
+
+class TarballSource(_LocalSource):
+    """JHU CSVs inside a tarball; members are matched by file name, in any folder.
+
+    The archive is only opened when its own size or mtime changes; each
+    member is then tracked by its size and mtime inside the archive.
+    """
+
+    def __init__(self, path, files=None):
+        super().__init__(files)
+        self.path = path
+        self._archive_stat = None
+        self._last = None
+
+    def fetch_all(self):
+        started = time.perf_counter()
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                raise FetchError(next(iter(self.files)), e) from e
+            archive_stat = (stat.st_mtime_ns, stat.st_size)
+            if self._last is not None and archive_stat == self._archive_stat:
+                return {
+                    data_type: FetchResult(
+                        data_type, result.url, result.content, 304, time.perf_counter() - started, True, result.digest
+                    )
+                    for data_type, result in self._last.items()
+                }
+
+            results = {}
+            data_type = next(iter(self.files))
+            try:
+                with tarfile.open(self.path) as archive:
+                    members = {os.path.basename(member.name): member for member in archive.getmembers() if member.isfile()}
+                    for data_type, filename in self.files.items():
+                        member = members.get(filename)
+                        if member is None:
+                            raise FetchError(data_type, FileNotFoundError(f"{filename} not in {self.path}"))
+                        results[data_type] = self._result(
+                            data_type,
+                            f"{self.path}!{member.name}",
+                            (member.mtime, member.size),
+                            lambda: archive.extractfile(member).read(),
+                            started
+                        )
+            except (OSError, EOFError, tarfile.TarError) as e:
+                # A truncated or half-written archive, e.g. a mirror caught mid-sync
+                raise FetchError(data_type, e) from e
+            self._archive_stat = archive_stat
+            self._last = results
+            return results
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def open_source(location=None, files=None):
+    """Data source for a location: an http(s) base URL, a directory or a tarball.
+
+    Defaults to COVID_DATA_SOURCE, then to JHU_BASE_URL. files maps data
+    types to file names, JHU_FILES unless given.
+    """
+    location = location or os.environ.get("COVID_DATA_SOURCE")
+    if location is None:
+        return JHUFetcher(jhu_urls(files=files))
+    if location.startswith(('http://', 'https://')):
+        return JHUFetcher(jhu_urls(location, files))
+    if os.path.isdir(location):
+        return LocalDirectorySource(location, files)
+    if location.endswith(TARBALL_SUFFIXES):
+        return TarballSource(location, files)
+    raise ValueError(f"Not a URL, directory or tarball: {location}")
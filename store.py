@@ -0,0 +1,165 @@
+"""On-disk columnar cache of the processed COVID-19 dataset"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from cube import COUNT_METRICS, ID_COLUMNS, RATE_METRICS, CovidCube, RegionCube
+
+# Bump when the processed schema changes; entries written under another
+# version are dropped on the next eviction pass.
+FORMAT_VERSION = 5
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "COVID_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "covid_tracker")
+)
+
+
+def source_key(digests):
+    """Cache key for a set of source files from their fetch digests ({data_type: hex digest}).
+
+    Only the short per-file digests are hashed, never the file contents.
+    """
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}".encode())
+    for data_type in sorted(digests):
+        digest.update(f"{data_type}:{digests[data_type]};".encode())
+    return digest.hexdigest()
+
+
+def _planes_table(counts, rates, dates, **axes):
+    # One flat column per array rather than per metric, so each reloads as a
+    # single contiguous buffer that reshapes back to (metric, row, date)
+    columns = {'counts': counts.reshape(-1), 'rates': rates.reshape(-1)}
+    metadata = {name: json.dumps(values) for name, values in axes.items()}
+    metadata['dates'] = json.dumps(dates.strftime('%Y-%m-%d').tolist())
+    return pa.table(columns, metadata=metadata)
+
+
+def _table_planes(table, n_rows):
+    """(dates, counts, rates) as read-only views of the table's buffers; nothing is copied"""
+    dates = pd.to_datetime(json.loads(table.schema.metadata[b'dates']))
+
+    def planes(name, metrics):
+        # combine_chunks hands back the single chunk as is, and an empty array for a table read back with none
+        return table.column(name).combine_chunks().to_numpy().reshape(len(metrics), n_rows, len(dates))
+
+    return dates, planes('counts', COUNT_METRICS), planes('rates', RATE_METRICS)
+
+
+def cube_to_table(cube):
+    """The counts and rates arrays as flattened columns; the axes travel in the schema metadata"""
+    return _planes_table(cube.counts, cube.rates, cube.dates, countries=list(cube.countries))
+
+
+def table_to_cube(table, regions=None):
+    countries = json.loads(table.schema.metadata[b'countries'])
+    return CovidCube(countries, *_table_planes(table, len(countries)), regions=regions)
+
+
+def regions_to_table(regions):
+    """Like cube_to_table, with the region identifiers as row lists in the metadata"""
+    ids = {column: regions.regions[column].tolist() for column in ID_COLUMNS}
+    return _planes_table(regions.counts, regions.rates, regions.dates, **ids)
+
+
+def table_to_regions(table):
+    ids = pd.DataFrame({column: json.loads(table.schema.metadata[column.encode()]) for column in ID_COLUMNS})
+    return RegionCube(ids, *_table_planes(table, len(ids)))
+
+
+class ProcessedStore:
+    """Arrow IPC files of processed cubes, one per source key.
+
+    Files are written uncompressed so a reload can memory-map them: the
+    loaded cube's arrays are views of the mapped pages, not copies. Only the
+    newest max_entries are retained. The province/state rollup of an entry
+    is kept next to it in `{key}.regions.arrow`, and an entry missing it
+    counts as a miss.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_entries=3):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.dir = self.root / f"v{FORMAT_VERSION}"
+
+    def path(self, key):
+        return self.dir / f"{key}.arrow"
+
+    def regions_path(self, key):
+        return self.dir / f"{key}.regions.arrow"
+
+    def _entries(self):
+        if not self.dir.is_dir():
+            return []
+        entries = [p for p in self.dir.glob("*.arrow") if p.is_file() and not p.name.endswith(".regions.arrow")]
+        return sorted(entries, key=lambda p: p.stat().st_mtime, reverse=True)
+
+    def _read_table(self, path):
+        with pa.memory_map(str(path), 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _read(self, key):
+        regions = table_to_regions(self._read_table(self.regions_path(key)))
+        return table_to_cube(self._read_table(self.path(key)), regions)
+
+    def _remove(self, key):
+        self.path(key).unlink(missing_ok=True)
+        self.regions_path(key).unlink(missing_ok=True)
+
+    def load(self, key):
+        """Return the cube stored for key, or None"""
+        path = self.path(key)
+        if not path.is_file():
+            return None
+        try:
+            cube = self._read(key)
+        except (OSError, KeyError, ValueError, IndexError):
+            self._remove(key)
+            return None
+        os.utime(path)
+        return cube
+
+    def latest(self):
+        """Return (key, cube) for the most recently used entry, or None"""
+        for path in self._entries():
+            cube = self.load(path.stem)
+            if cube is not None:
+                return path.stem, cube
+        return None
+
+    def _write(self, path, table):
+        fd, tmp_path = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def save(self, key, cube):
+        """Write cube under key atomically, then evict stale entries.
+
+        The regions file goes first, so a cube file is never visible
+        without its rollup.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._write(self.regions_path(key), regions_to_table(cube.regions))
+        self._write(self.path(key), cube_to_table(cube))
+        self.evict()
+
+    def evict(self):
+        """Drop entries beyond max_entries and any other format version"""
+        for path in self._entries()[self.max_entries:]:
+            self._remove(path.stem)
+        if self.root.is_dir():
+            for other in self.root.iterdir():
+                if other.is_dir() and other.name.startswith('v') and other != self.dir:
+                    shutil.rmtree(other, ignore_errors=True)
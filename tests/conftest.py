@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import fetch_results, synthetic_jhu  # noqa: E402
+from cube import build_cube  # noqa: E402
+from service import parse_covid_data  # noqa: E402
+
+
+@pytest.fixture
+def frames(request):
+    """Raw wide frames of a synthetic JHU download, as parse_covid_data returns them.
+
+    Parametrize indirectly with (n_regions, n_days, seed) to change the size:
+
+        @pytest.mark.parametrize('frames', [(40, 30, 5)], indirect=True)
+    """
+    n_regions, n_days, seed = getattr(request, 'param', (60, 40, 3))
+    return parse_covid_data(fetch_results(synthetic_jhu(n_regions, n_days, seed)))
+
+
+@pytest.fixture
+def cube(frames):
+    """The cube built from `frames`"""
+    return build_cube(frames)
@@ -0,0 +1,117 @@
+import http.client
+import io
+import json
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from api import ARROW_MIME, QueryAPI, QueryServer
+from risk import RiskMetrics
+from service import DataVersion
+
+
+class Service:
+    """Stands in for DataService: the API only reads `current`"""
+
+    def __init__(self, version=None):
+        self.current = version
+
+
+@pytest.fixture
+def version(cube):
+    population = pd.Series({country: 1_000_000.0 for country in cube.countries[1:]})
+    return DataVersion(1, 'a' * 64, cube, RiskMetrics.from_cube(cube, population), datetime.now(timezone.utc))
+
+
+@pytest.fixture
+def api(version):
+    return QueryAPI(Service(version))
+
+
+def _json(response):
+    status, headers, body = response
+    return status, json.loads(body)
+
+
+def test_version(api, version):
+    status, headers, body = api.handle('/v1/version')
+    assert status == 200
+    assert headers['Content-Type'] == 'application/json'
+    info = json.loads(body)
+    assert info['version'] == 1
+    assert info['countries'] == len(version.cube.countries)
+    assert info['last_date'] == version.cube.dates[-1].strftime('%Y-%m-%d')
+
+
+def test_matching_etag_is_not_modified(api):
+    status, headers, _ = api.handle('/v1/latest')
+    assert status == 200
+    assert api.handle('/v1/latest', {'If-None-Match': headers['ETag']}) == (304, headers, b'')
+    assert api.handle('/v1/latest', {'If-None-Match': '"stale"'})[0] == 200
+
+
+def test_timeseries(api, version):
+    country = version.cube.countries[0]
+    status, body = _json(api.handle(f'/v1/timeseries?country={country}&metric=Confirmed&start=2020-02-01'))
+    assert status == 200
+    assert body['dates'][0] == '2020-02-01'
+    assert list(body['series']) == [country]
+    assert body['series'][country]['Confirmed'] == version.cube.select([country]).between('2020-02-01')['Confirmed'][0].tolist()
+
+
+def test_timezone_aware_dates_are_converted_to_utc(api, version):
+    country = version.cube.countries[0]
+    status, body = _json(api.handle(f'/v1/timeseries?country={country}&start=2020-02-01T00:00Z&end=2020-02-03T01:00%2B01:00'))
+    assert status == 200
+    assert body['dates'] == ['2020-02-01', '2020-02-02', '2020-02-03']
+
+
+def test_arrow_format(api, version):
+    status, headers, body = api.handle('/v1/risk', {'Accept': ARROW_MIME})
+    assert status == 200
+    assert headers['Content-Type'] == ARROW_MIME
+    table = pa.ipc.open_stream(io.BytesIO(body)).read_all()
+    assert table.num_rows == len(version.cube.countries)
+
+
+@pytest.mark.parametrize('target', [
+    '/v1/timeseries?country=Country%2000000&start=not-a-date',
+    '/v1/latest?date=NaT',
+    '/v1/timeseries?country=Country%2000000&metric=Hospitalized',
+    '/v1/timeseries',
+    '/v1/latest?format=xml'
+])
+def test_bad_request(api, target):
+    status, body = _json(api.handle(target))
+    assert status == 400
+    assert body['error']
+
+
+@pytest.mark.parametrize('target', ['/v1/latest?country=Atlantis', '/v1/nothing'])
+def test_not_found(api, target):
+    status, body = _json(api.handle(target))
+    assert status == 404
+    assert body['error']
+
+
+def test_unavailable_before_first_load():
+    status, body = _json(QueryAPI(Service()).handle('/v1/latest'))
+    assert status == 503
+
+
+def test_server_answers_500_when_handling_fails():
+    class Broken:
+        @property
+        def current(self):
+            raise RuntimeError("boom")
+
+    with QueryServer(QueryAPI(Broken()), port=0) as server:
+        host, port = server._server.server_address[:2]
+        connection = http.client.HTTPConnection(host, port, timeout=5)
+        connection.request('GET', '/v1/latest')
+        response = connection.getresponse()
+        assert response.status == 500
+        assert json.loads(response.read())['error']
+        connection.close()
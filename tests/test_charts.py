@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts
+from charts import create_risk_chart
+from risk import RiskMetrics
+
+
+@pytest.fixture
+def risk(cube):
+    population = pd.Series({country: 500_000.0 for country in cube.countries})
+    return RiskMetrics.from_cube(cube, population)
+
+
+def test_risk_chart_downsamples_only_the_selected_rows(risk, monkeypatch):
+    shapes = []
+    downsample_indices = charts.downsample_indices
+
+    def recording(values, max_points=None):
+        shapes.append(np.shape(values))
+        return downsample_indices(values, max_points)
+
+    monkeypatch.setattr(charts, 'downsample_indices', recording)
+    selected = [risk.countries[3], 'Atlantis', risk.countries[1]]
+    fig = create_risk_chart(risk, selected, max_points=10)
+
+    assert shapes == [(2, len(risk.dates))]
+    assert [trace.name for trace in fig.data] == [risk.countries[3], risk.countries[1]]
+    row = risk.country_index[risk.countries[1]]
+    trace = fig.data[1]
+    assert len(trace.x) <= 10
+    assert trace.y[-1] == pytest.approx(risk.incidence[row, -1])
+
+
+def test_risk_chart_without_countries(risk):
+    assert len(create_risk_chart(risk, [], max_points=10).data) == 0
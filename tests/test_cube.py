@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import fetch_results
+from cube import build_cube, extend_cube
+from service import parse_covid_data, process_covid_data
+
+
+def _files(frames, drop=0):
+    """CSV bytes of the frames without their last `drop` date columns"""
+    return {
+        data_type: (df.iloc[:, :len(df.columns) - drop] if drop else df).to_csv(index=False).encode()
+        for data_type, df in frames.items()
+    }
+
+
+def _assert_same(cube, expected):
+    assert list(cube.countries) == list(expected.countries)
+    assert cube.dates.equals(expected.dates)
+    np.testing.assert_array_equal(cube.counts, expected.counts)
+    np.testing.assert_array_equal(cube.rates, expected.rates)
+    assert cube.regions.regions.equals(expected.regions.regions)
+    np.testing.assert_array_equal(cube.regions.counts, expected.regions.counts)
+    np.testing.assert_array_equal(cube.regions.rates, expected.regions.rates)
+
+
+@pytest.mark.parametrize('new_days', [1, 3, 10, 37])
+def test_extend_matches_full_build(frames, new_days):
+    yesterday = parse_covid_data(fetch_results(_files(frames, drop=new_days)))
+    today = parse_covid_data(fetch_results(_files(frames)))
+    previous = build_cube(yesterday)
+
+    extended = extend_cube(previous, today, yesterday)
+    assert extended is not None
+    assert len(extended.dates) == len(previous.dates) + new_days
+    _assert_same(extended, build_cube(today))
+
+
+def test_unchanged_files_return_the_same_cube(frames):
+    raw_data = parse_covid_data(fetch_results(_files(frames)))
+    cube = build_cube(raw_data)
+    assert extend_cube(cube, dict(raw_data), raw_data) is cube
+
+
+def test_revised_history_rebuilds(frames):
+    yesterday = parse_covid_data(fetch_results(_files(frames, drop=2)))
+    revised = {data_type: df.copy() for data_type, df in frames.items()}
+    revised['deaths'].iloc[5, 10] += 1
+    today = parse_covid_data(fetch_results(_files(revised)))
+    previous = build_cube(yesterday)
+
+    assert extend_cube(previous, today, yesterday) is None
+    _assert_same(process_covid_data(today, (previous, yesterday)), build_cube(today))
+
+
+def test_new_region_rebuilds(frames):
+    yesterday = parse_covid_data(fetch_results(_files(frames, drop=1)))
+    today = parse_covid_data(fetch_results(_files(frames)))
+    today['confirmed'] = today['confirmed'].iloc[:-1]
+    assert extend_cube(build_cube(yesterday), today, yesterday) is None
+
+
+def test_cube_not_built_from_previous_frames_rebuilds(frames):
+    older = parse_covid_data(fetch_results(_files(frames, drop=2)))
+    yesterday = parse_covid_data(fetch_results(_files(frames, drop=1)))
+    today = parse_covid_data(fetch_results(_files(frames)))
+    assert extend_cube(build_cube(older), today, yesterday) is None
+
+
+def _melt_merge(raw_data):
+    """The per-row pipeline process_covid_data used before the cube"""
+    processed_data = {}
+    for data_type, df in raw_data.items():
+        df_melted = pd.melt(
+            df,
+            id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'],
+            var_name='Date',
+            value_name=data_type.capitalize()
+        )
+        df_melted['Date'] = pd.to_datetime(df_melted['Date'], format='%m/%d/%y')
+        df_country = df_melted.groupby(['Country/Region', 'Date'])[data_type.capitalize()].sum().reset_index()
+        processed_data[data_type] = df_country
+
+    merged_df = processed_data['confirmed']
+    for data_type in ['deaths', 'recovered']:
+        if data_type in processed_data:
+            merged_df = merged_df.merge(processed_data[data_type], on=['Country/Region', 'Date'], how='left')
+
+    merged_df = merged_df.fillna(0)
+    merged_df['Active'] = (merged_df['Confirmed'] - merged_df['Deaths'] - merged_df.get('Recovered', 0)).clip(lower=0)
+    merged_df = merged_df.sort_values(['Country/Region', 'Date'])
+    by_country = merged_df.groupby('Country/Region')
+    merged_df['New_Cases'] = by_country['Confirmed'].diff().fillna(0)
+    merged_df['New_Deaths'] = by_country['Deaths'].diff().fillna(0)
+    for metric in ['New_Cases', 'New_Deaths']:
+        merged_df[f'{metric}_7MA'] = (
+            merged_df.groupby('Country/Region')[metric].rolling(window=7, min_periods=1).mean().reset_index(0, drop=True)
+        )
+    return merged_df.reset_index(drop=True)
+
+
+def test_to_frame_matches_melt_merge(frames):
+    raw_data = {data_type: df.copy() for data_type, df in frames.items()}
+    # Countries missing from deaths and recovered, as Canada is in the real recovered file
+    raw_data['deaths'] = raw_data['deaths'].iloc[3:]
+    raw_data['recovered'] = raw_data['recovered'][raw_data['recovered']['Country/Region'] != 'Country 00002']
+
+    frame = build_cube(raw_data).to_frame()
+    expected = _melt_merge(raw_data)
+
+    assert isinstance(frame['Country/Region'].dtype, pd.CategoricalDtype)
+    assert frame['Date'].dtype == expected['Date'].dtype
+    for metric in ['Confirmed', 'Deaths', 'Recovered', 'Active']:
+        assert frame[metric].dtype == np.int32
+    for metric in ['New_Cases', 'New_Deaths', 'New_Cases_7MA', 'New_Deaths_7MA']:
+        assert frame[metric].dtype == np.float32
+
+    assert len(frame) == len(expected)
+    np.testing.assert_array_equal(frame['Country/Region'].astype(str), expected['Country/Region'].astype(str))
+    np.testing.assert_array_equal(frame['Date'], expected['Date'])
+    for metric in ['Confirmed', 'Deaths', 'Recovered', 'Active', 'New_Cases', 'New_Deaths']:
+        np.testing.assert_array_equal(frame[metric], expected[metric], err_msg=metric)
+    for metric in ['New_Cases_7MA', 'New_Deaths_7MA']:
+        np.testing.assert_allclose(frame[metric], expected[metric], rtol=1e-6, err_msg=metric)
+
+
+def test_between_keeps_latest_only_for_a_non_empty_tail(cube):
+    latest = cube.latest()
+    tail = cube.between(cube.dates[-5])
+    assert tail.latest() is latest
+
+    after = cube.between('2030-01-01')
+    assert len(after.dates) == 0
+    assert after.latest().empty
+    assert (after.totals() == 0).all()
+
+    head = cube.between(None, cube.dates[-2])
+    np.testing.assert_array_equal(head.latest()['Confirmed'], cube['Confirmed'][:, -2])
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from downsample import downsample_indices, lttb_indices
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(7)
+    values = np.cumsum(rng.normal(0, 1, (5, 200)), axis=1)
+    values[1] = np.nan
+    values[2, 37] = 1_000.0
+    values[3, -1] = 1_000.0
+    values[4, ::3] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('max_points', [2, 3, 4, 5, 10, 64, 199])
+def test_budget_peak_and_last_value(values, max_points):
+    keep = downsample_indices(values, max_points)
+    assert len(keep) == len(values)
+    peaks = np.where(np.isnan(values), -np.inf, values).argmax(axis=1)
+    for row, indices in enumerate(keep):
+        assert len(indices) <= max_points
+        assert np.all(np.diff(indices) > 0)
+        assert indices[-1] == values.shape[1] - 1
+        assert peaks[row] in indices
+    assert 37 in keep[2]
+
+
+def test_short_series_and_no_budget_keep_everything(values):
+    assert all(len(indices) == 200 for indices in downsample_indices(values, None))
+    assert all(len(indices) == 200 for indices in downsample_indices(values, 200))
+    assert all(len(indices) == 3 for indices in downsample_indices(values[:, :3], 3))
+
+
+def test_budget_below_two_is_rejected(values):
+    with pytest.raises(ValueError):
+        downsample_indices(values, 1)
+
+
+def test_lttb_keeps_first_and_last():
+    kept = lttb_indices(np.sin(np.arange(100) / 5)[np.newaxis], 12)
+    assert kept.shape == (1, 12)
+    assert kept[0, 0] == 0 and kept[0, -1] == 99
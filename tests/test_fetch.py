@@ -0,0 +1,59 @@
+import pytest
+
+from fetch import FetchError, JHUFetcher, LocalMirrorServer, content_digest, jhu_urls
+
+FILES = {
+    'confirmed': "confirmed.csv",
+    'deaths': "deaths.csv"
+}
+BODY = b"Province/State,Country/Region,Lat,Long,1/22/20\n,Italy,41.9,12.6,3\n"
+
+
+@pytest.fixture
+def mirror():
+    with LocalMirrorServer({filename: BODY for filename in FILES.values()}) as server:
+        yield server
+
+
+@pytest.fixture
+def fetcher(mirror):
+    fetcher = JHUFetcher(jhu_urls(mirror.base_url, FILES), timeout=5)
+    yield fetcher
+    fetcher.close()
+
+
+def test_repeat_fetch_is_not_modified(fetcher):
+    first = fetcher.fetch_all()
+    assert {r.status for r in first.values()} == {200}
+    assert not any(r.not_modified for r in first.values())
+
+    second = fetcher.fetch_all()
+    for data_type, result in second.items():
+        assert result.status == 304
+        assert result.not_modified
+        assert result.content == first[data_type].content == BODY
+        assert result.digest == first[data_type].digest == content_digest(BODY)
+
+
+def test_new_body_is_downloaded_again(mirror, fetcher):
+    fetcher.fetch_all()
+    updated = BODY.rstrip(b"\n") + b"\n,Spain,40.5,-3.7,1\n"
+    mirror.put(FILES['deaths'], updated)
+
+    results = fetcher.fetch_all()
+    assert results['confirmed'].status == 304
+    assert results['deaths'].status == 200
+    assert not results['deaths'].not_modified
+    assert results['deaths'].content == updated
+    assert results['deaths'].digest == content_digest(updated)
+
+
+def test_missing_file_raises_fetch_error(mirror):
+    fetcher = JHUFetcher(jhu_urls(mirror.base_url, dict(FILES, recovered="recovered.csv")), timeout=5)
+    try:
+        with pytest.raises(FetchError) as excinfo:
+            fetcher.fetch_all()
+    finally:
+        fetcher.close()
+    assert excinfo.value.data_type == 'recovered'
+    assert ('recovered.csv', 404) in mirror.requests
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+import reports
+from reports import check_range, generate_reports
+from store import ProcessedStore
+
+
+@pytest.fixture
+def store(tmp_path, cube):
+    store = ProcessedStore(tmp_path / "store")
+    store.save('key', cube)
+    return store
+
+
+def test_range_after_last_date_fails_before_spawning(tmp_path, store, cube, monkeypatch):
+    monkeypatch.setattr(reports, 'ProcessPoolExecutor', None)
+    with pytest.raises(ValueError, match="no data between 2030-01-01"):
+        generate_reports(store, 'key', list(cube.countries[:2]), str(tmp_path / "out"), start='2030-01-01')
+    assert not os.path.exists(tmp_path / "out")
+
+
+def test_check_range(cube):
+    check_range(cube, cube.dates[-1], None)
+    with pytest.raises(ValueError):
+        check_range(cube, None, '2019-12-31')
+    with pytest.raises(ValueError):
+        check_range(cube, 'not a date')
+    with pytest.raises(ValueError, match="no dates"):
+        check_range(cube.between('2030-01-01'))
+
+
+def test_generate_reports(tmp_path, store, cube):
+    countries = list(cube.countries[:2])
+    summaries = generate_reports(store, 'key', countries, str(tmp_path / "out"), workers=1, start=cube.dates[-10])
+    assert sorted(summary['country'] for summary in summaries) == countries
+    written = os.listdir(tmp_path / "out")
+    assert 'index.html' in written
+    assert all(summary['page'] in written for summary in summaries)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from cube import CovidCube
+from risk import RISK_LEVELS, RiskMetrics, load_population
+
+
+def _cube(countries, new_cases_7ma):
+    new_cases_7ma = np.asarray(new_cases_7ma, dtype='float32')
+    n_countries, n_dates = new_cases_7ma.shape
+    counts = np.zeros((4, n_countries, n_dates), dtype='int32')
+    rates = np.zeros((4, n_countries, n_dates), dtype='float32')
+    rates[2] = new_cases_7ma
+    return CovidCube(countries, pd.date_range('2021-03-01', periods=n_dates), counts, rates)
+
+
+def test_country_missing_from_population_is_unknown():
+    population = pd.Series({'Italy': 1_000_000.0, 'Spain': 2_000_000.0})
+    cube = _cube(['Diamond Princess', 'Italy', 'Spain'], [[5, 10], [2, 30], [100, 1]])
+
+    risk = RiskMetrics.from_cube(cube, population)
+    assert np.isnan(risk.population[0])
+    assert np.isnan(risk.incidence[0]).all()
+    assert (risk.tiers[0] == -1).all()
+    np.testing.assert_allclose(risk.incidence[1:], [[1.4, 21.0], [35.0, 0.35]], rtol=1e-6)
+    np.testing.assert_array_equal(risk.tiers[1:], [[0, 0], [1, 0]])
+
+    ranking = risk.ranking()
+    assert ranking['Country/Region'].iloc[-1] == 'Diamond Princess'
+    assert ranking['Risk'].iloc[-1] == RISK_LEVELS[-1][0]
+    assert ranking['Population'].isna().iloc[-1]
+
+
+def test_bundled_table_leaves_ships_and_games_unknown():
+    population = load_population()
+    countries = ['Antarctica', 'Diamond Princess', 'Germany', 'MS Zaandam', 'Summer Olympics 2020']
+    risk = RiskMetrics.from_cube(_cube(countries, np.full((5, 3), 50.0)), population)
+    known = np.array([country in population.index for country in countries])
+    assert known.any() and not known.all()
+    assert (risk.tiers[~known] == -1).all()
+    assert (risk.tiers[known] >= 0).all()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling import MA_WINDOWS, deltas, rolling_mean, rolling_means
+
+
+def _history(n_countries, n_dates, seed=0):
+    """Cumulative counts as (country, date) plus the same data as a long frame"""
+    rng = np.random.default_rng(seed)
+    values = np.cumsum(rng.poisson(rng.gamma(1.5, 300, (n_countries, 1)), (n_countries, n_dates)), axis=1)
+    long = pd.DataFrame({
+        'Country/Region': np.repeat([f'Country {i}' for i in range(n_countries)], n_dates),
+        'Value': values.reshape(-1).astype('float64')
+    })
+    return values, long
+
+
+@pytest.mark.parametrize('n_dates', [1, 5, 13, 27, 90])
+def test_deltas_match_groupby_diff(n_dates):
+    values, long = _history(6, n_dates)
+    expected = long.groupby('Country/Region')['Value'].diff().fillna(0)
+    np.testing.assert_array_equal(deltas(values).reshape(-1), expected.to_numpy())
+
+
+@pytest.mark.parametrize('n_dates', [1, 5, 13, 27, 90])
+def test_rolling_means_match_groupby_rolling(n_dates):
+    values, long = _history(6, n_dates, seed=n_dates)
+    means = rolling_means(values)
+    assert sorted(means) == sorted(MA_WINDOWS)
+    for window in MA_WINDOWS:
+        expected = (
+            long.groupby('Country/Region')['Value']
+            .rolling(window, min_periods=1).mean()
+            .reset_index(level=0, drop=True)
+            .sort_index()
+        )
+        np.testing.assert_allclose(means[window].reshape(-1), expected.to_numpy(), rtol=1e-12)
+        np.testing.assert_allclose(rolling_mean(values, window), means[window], rtol=0)
+
+
+def test_leading_axes_are_independent():
+    values, _ = _history(6, 40)
+    stacked = np.stack([values, values * 2])
+    np.testing.assert_array_equal(deltas(stacked)[1], deltas(values * 2))
+    np.testing.assert_allclose(rolling_mean(stacked, 14)[0], rolling_mean(values, 14), rtol=0)
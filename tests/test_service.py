@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import build_cube
+from fetch import JHU_FILES
+from service import DataService
+from sources import LocalDirectorySource
+from store import ProcessedStore
+
+
+class FlakyStore(ProcessedStore):
+    """A store whose next `failures` saves raise OSError"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.failures = 0
+
+    def save(self, key, cube):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        super().save(key, cube)
+
+
+def _write(directory, frames, n_dates):
+    for data_type, df in frames.items():
+        df.iloc[:, :4 + n_dates].to_csv(directory / JHU_FILES[data_type], index=False)
+
+
+def _service(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    store = FlakyStore(tmp_path / "store")
+    service = DataService(LocalDirectorySource(str(data_dir)), store, population=pd.Series(dtype='float64'))
+    return service, data_dir, store
+
+
+def _assert_built_from(version, frames, n_dates):
+    expected = build_cube({data_type: df.iloc[:, :4 + n_dates] for data_type, df in frames.items()})
+    assert version.cube.dates.equals(expected.dates)
+    np.testing.assert_array_equal(version.cube.counts, expected.counts)
+    np.testing.assert_array_equal(version.cube.rates, expected.rates)
+
+
+@pytest.mark.parametrize('frames', [(40, 30, 5)], indirect=True)
+def test_incremental_refresh_matches_full_build(tmp_path, frames):
+    service, data_dir, _ = _service(tmp_path)
+    _write(data_dir, frames, 20)
+    _assert_built_from(service.refresh(), frames, 20)
+    _write(data_dir, frames, 25)
+    _assert_built_from(service.refresh(), frames, 25)
+
+
+@pytest.mark.parametrize('frames', [(40, 30, 5)], indirect=True)
+def test_failed_save_does_not_advance_ingest_state(tmp_path, frames):
+    service, data_dir, store = _service(tmp_path)
+    _write(data_dir, frames, 20)
+    first = service.refresh()
+    parsed = service._parsed
+
+    _write(data_dir, frames, 22)
+    store.failures = 1
+    with pytest.raises(OSError):
+        service.refresh()
+    assert service.current is first
+    assert service._parsed is parsed
+
+    second = service.refresh()
+    assert second.number == first.number + 1
+    _assert_built_from(second, frames, 22)
+    assert store.load(second.key) is not None
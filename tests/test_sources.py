@@ -0,0 +1,151 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+import sources
+from fetch import JHU_FILES, FetchError
+from sources import LocalDirectorySource, TarballSource, open_source
+
+FILES = {
+    'confirmed': b"Province/State,Country/Region,Lat,Long,1/22/20\n,Italy,41.9,12.6,3\n",
+    'deaths': b"Province/State,Country/Region,Lat,Long,1/22/20\n,Italy,41.9,12.6,1\n",
+    'recovered': b"Province/State,Country/Region,Lat,Long,1/22/20\n,Italy,41.9,12.6,0\n"
+}
+
+
+def _touch(path, seconds):
+    """Move a file's mtime forward, so a rewrite is seen even on coarse-grained clocks"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def _write_dir(directory, files):
+    for data_type, content in files.items():
+        (directory / JHU_FILES[data_type]).write_bytes(content)
+
+
+def _write_tar(path, files, mtime=1_600_000_000):
+    with tarfile.open(path, 'w:gz') as archive:
+        for data_type, content in files.items():
+            info = tarfile.TarInfo(f"time_series/{JHU_FILES[data_type]}")
+            info.size = len(content)
+            info.mtime = mtime
+            archive.addfile(info, io.BytesIO(content))
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Paths read from disk by the directory source"""
+    paths = []
+    read = sources._read
+
+    def counting_read(path):
+        paths.append(os.path.basename(path))
+        return read(path)
+
+    monkeypatch.setattr(sources, '_read', counting_read)
+    return paths
+
+
+def test_directory_unchanged_stat_is_not_read_again(tmp_path, reads):
+    _write_dir(tmp_path, FILES)
+    source = open_source(str(tmp_path))
+    assert isinstance(source, LocalDirectorySource)
+
+    first = source.fetch_all()
+    assert {result.status for result in first.values()} == {200}
+    assert len(reads) == 3
+
+    second = source.fetch_all()
+    assert all(result.not_modified and result.status == 304 for result in second.values())
+    assert {data_type: r.digest for data_type, r in second.items()} == {data_type: r.digest for data_type, r in first.items()}
+    assert len(reads) == 3
+
+
+def test_directory_same_bytes_rewrite_is_not_modified(tmp_path, reads):
+    _write_dir(tmp_path, FILES)
+    source = LocalDirectorySource(str(tmp_path))
+    source.fetch_all()
+
+    path = tmp_path / JHU_FILES['deaths']
+    path.write_bytes(FILES['deaths'])
+    _touch(path, 5)
+    updated = FILES['recovered'].replace(b",0\n", b",2\n")
+    (tmp_path / JHU_FILES['recovered']).write_bytes(updated)
+
+    results = source.fetch_all()
+    assert reads[3:] == [JHU_FILES['deaths'], JHU_FILES['recovered']]
+    assert results['confirmed'].not_modified
+    assert results['deaths'].not_modified and results['deaths'].status == 304
+    assert not results['recovered'].not_modified and results['recovered'].content == updated
+
+
+def test_directory_missing_file_raises_fetch_error(tmp_path):
+    _write_dir(tmp_path, {'confirmed': FILES['confirmed']})
+    with pytest.raises(FetchError) as excinfo:
+        LocalDirectorySource(str(tmp_path)).fetch_all()
+    assert excinfo.value.data_type == 'deaths'
+
+
+@pytest.fixture
+def opens(monkeypatch):
+    """Number of times the tarball source opened an archive"""
+    count = [0]
+    open_tar = tarfile.open
+
+    def counting_open(name, mode='r', *args, **kwargs):
+        if mode.startswith('r'):
+            count[0] += 1
+        return open_tar(name, mode, *args, **kwargs)
+
+    monkeypatch.setattr(sources.tarfile, 'open', counting_open)
+    return count
+
+
+def test_tarball_reopened_only_when_archive_changes(tmp_path, opens):
+    path = tmp_path / "jhu.tgz"
+    _write_tar(path, FILES)
+    source = open_source(str(path))
+    assert isinstance(source, TarballSource)
+
+    first = source.fetch_all()
+    assert {result.status for result in first.values()} == {200}
+    second = source.fetch_all()
+    assert all(result.not_modified for result in second.values())
+    assert opens[0] == 1
+
+    # Same members rewritten into a new archive: opened again, nothing changed
+    _write_tar(path, FILES)
+    _touch(path, 5)
+    third = source.fetch_all()
+    assert opens[0] == 2
+    assert all(result.not_modified for result in third.values())
+
+    updated = dict(FILES, confirmed=FILES['confirmed'].replace(b",3\n", b",4\n"))
+    _write_tar(path, updated, mtime=1_600_086_400)
+    _touch(path, 10)
+    fourth = source.fetch_all()
+    assert opens[0] == 3
+    assert not fourth['confirmed'].not_modified and fourth['confirmed'].content == updated['confirmed']
+    assert fourth['deaths'].not_modified and fourth['recovered'].not_modified
+
+
+def test_tarball_missing_member_raises_fetch_error(tmp_path):
+    path = tmp_path / "jhu.tgz"
+    _write_tar(path, {'confirmed': FILES['confirmed'], 'deaths': FILES['deaths']})
+    with pytest.raises(FetchError) as excinfo:
+        TarballSource(str(path)).fetch_all()
+    assert excinfo.value.data_type == 'recovered'
+
+
+@pytest.mark.parametrize('damage', ['truncated', 'bad header'])
+def test_damaged_tarball_raises_fetch_error(tmp_path, damage):
+    path = tmp_path / "jhu.tgz"
+    _write_tar(path, FILES)
+    content = path.read_bytes()
+    path.write_bytes(content[:len(content) // 2] if damage == 'truncated' else b"not a tarball" + content[13:])
+    with pytest.raises(FetchError) as excinfo:
+        TarballSource(str(path)).fetch_all()
+    assert excinfo.value.data_type in FILES
@@ -0,0 +1,62 @@
+import numpy as np
+
+import pytest
+
+from cube import build_cube
+from store import ProcessedStore
+
+pytestmark = pytest.mark.parametrize('frames', [(40, 60, 0)], indirect=True)
+
+
+def _mapped(array):
+    """True if array is a view into an Arrow buffer rather than memory numpy owns"""
+    while isinstance(array, np.ndarray):
+        if array.flags.owndata:
+            return False
+        array = array.base
+    return array is not None
+
+
+def test_round_trip(tmp_path, cube):
+    store = ProcessedStore(tmp_path)
+    store.save('key', cube)
+
+    loaded = store.load('key')
+    assert list(loaded.countries) == list(cube.countries)
+    assert loaded.dates.equals(cube.dates)
+    np.testing.assert_array_equal(loaded.counts, cube.counts)
+    np.testing.assert_array_equal(loaded.rates, cube.rates)
+    assert loaded.counts.dtype == np.int32 and loaded.rates.dtype == np.float32
+    assert loaded.regions.regions.equals(cube.regions.regions)
+    np.testing.assert_array_equal(loaded.regions.counts, cube.regions.counts)
+    np.testing.assert_array_equal(loaded.regions.rates, cube.regions.rates)
+
+
+def test_load_does_not_copy(tmp_path, cube):
+    store = ProcessedStore(tmp_path)
+    store.save('key', cube)
+
+    loaded = store.load('key')
+    for array in (loaded.counts, loaded.rates, loaded.regions.counts, loaded.regions.rates):
+        assert _mapped(array)
+        assert not array.flags.writeable
+
+
+def test_missing_regions_file_is_a_miss(tmp_path, cube):
+    store = ProcessedStore(tmp_path)
+    store.save('key', cube)
+    store.regions_path('key').unlink()
+    assert store.load('key') is None
+    assert not store.path('key').exists()
+
+
+def test_zero_date_cube_round_trip(tmp_path, frames):
+    empty = build_cube({data_type: df.iloc[:, :4] for data_type, df in frames.items()})
+    assert len(empty.dates) == 0
+    store = ProcessedStore(tmp_path)
+    store.save('empty', empty)
+
+    key, loaded = store.latest()
+    assert key == 'empty'
+    assert loaded.counts.shape == empty.counts.shape
+    assert loaded.regions.rates.shape == empty.regions.rates.shape
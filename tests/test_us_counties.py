@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from benchmark import fetch_results
+from us_counties import build_us, read_wide_chunks
+
+DATES = "1/22/20,1/23/20,1/24/20"
+# UID, FIPS, Admin2, Province_State, Lat, Long_, Population, confirmed, deaths
+ROWS = [
+    (84001001, "1001.0", "Autauga", "Alabama", 32.54, -86.64, 55869, (1, 3, 6), (0, 0, 1)),
+    (84001003, "1003.0", "Baldwin", "Alabama", 30.73, -87.72, 223234, (2, 2, 9), (0, 1, 1)),
+    (84090001, "90001.0", "Unassigned", "Alabama", "", "", 0, (0, 4, 4), (0, 0, 2)),
+    (316, "", "", "Guam", 13.44, 144.79, 164229, (0, 5, 7), (0, 1, 1)),
+    (84088888, "", "", "Diamond Princess", "", "", 0, (40, 45, 49), (0, 0, 0)),
+    (84004013, "4013.0", "Maricopa", "Arizona", 33.35, -112.49, 4485414, (10, 20, 40), (1, 2, 3))
+]
+
+
+def _csv(rows, deaths):
+    header = "UID,iso2,iso3,code3,FIPS,Admin2,Province_State,Country_Region,Lat,Long_,Combined_Key"
+    lines = [header + (",Population," if deaths else ",") + DATES]
+    for uid, fips, county, state, lat, lon, population, confirmed, died in rows:
+        ids = f'{uid},US,USA,840,{fips},{county},{state},US,{lat},{lon},"{county}, {state}, US"'
+        values = died if deaths else confirmed
+        lines.append(ids + (f",{population}," if deaths else ",") + ",".join(map(str, values)))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _build(confirmed_rows=ROWS, deaths_rows=ROWS, chunk_rows=512):
+    files = {'confirmed': _csv(confirmed_rows, deaths=False), 'deaths': _csv(deaths_rows, deaths=True)}
+    return build_us(fetch_results(files), chunk_rows)
+
+
+def _county_rows(data):
+    regions = data.counties.regions
+    return {(state, county): i for i, (state, county) in enumerate(zip(regions['Country/Region'], regions['Province/State']))}
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 4, 512])
+def test_read_wide_chunks(chunk_rows):
+    ids, dates, values = read_wide_chunks(_csv(ROWS, deaths=True), chunk_rows)
+    assert list(ids['UID']) == [row[0] for row in ROWS]
+    assert ids['FIPS'].isna().sum() == 2
+    assert len(dates) == 3 and str(dates[0].date()) == '2020-01-22'
+    assert values.dtype == np.int32
+    np.testing.assert_array_equal(values, [row[8] for row in ROWS])
+
+
+def test_deaths_matched_to_confirmed_by_uid():
+    shuffled = [ROWS[i] for i in (5, 3, 0, 4, 2, 1)]
+    data = _build(deaths_rows=shuffled)
+    rows = _county_rows(data)
+    for _, _, county, state, *_, confirmed, deaths in ROWS:
+        row = rows[(state, county)]
+        np.testing.assert_array_equal(data.counties.counts[0, row], confirmed)
+        np.testing.assert_array_equal(data.counties.counts[1, row], deaths)
+    np.testing.assert_array_equal(data.counties.counts, _build().counties.counts)
+
+
+def test_county_missing_from_deaths_has_no_deaths():
+    data = _build(deaths_rows=ROWS[:1] + ROWS[2:])
+    row = _county_rows(data)[('Alabama', 'Baldwin')]
+    np.testing.assert_array_equal(data.counties.counts[0, row], ROWS[1][7])
+    np.testing.assert_array_equal(data.counties.counts[1, row], 0)
+    assert data.county_population[row] == 0
+
+
+def test_state_and_national_rollups_sum_the_counties():
+    data = _build(deaths_rows=ROWS[::-1])
+    assert list(data.states.countries) == ['Alabama', 'Arizona', 'Diamond Princess', 'Guam']
+    for state in data.states.countries:
+        rows = [i for (name, _), i in _county_rows(data).items() if name == state]
+        np.testing.assert_array_equal(
+            data.states.counts[:2, data.states.country_index[state]], data.counties.counts[:2, rows].sum(axis=1)
+        )
+    np.testing.assert_array_equal(data.national.counts[:2, 0], data.counties.counts[:2].sum(axis=1))
+    np.testing.assert_array_equal(data.national['Confirmed'][0], [53, 79, 115])
+    assert list(data.states.regions.provinces('Alabama').countries) == ['Autauga', 'Baldwin', 'Unassigned']
+
+
+def test_population_follows_the_county_rows():
+    data = _build(deaths_rows=ROWS[::-1])
+    population = {(row[3], row[2]): row[6] for row in ROWS}
+    for key, row in _county_rows(data).items():
+        assert data.county_population[row] == population[key]
+    assert dict(zip(data.states.countries, data.state_population)) == {
+        'Alabama': 55869 + 223234, 'Arizona': 4485414, 'Diamond Princess': 0, 'Guam': 164229
+    }
+
+
+def test_different_dates_are_rejected():
+    deaths = _csv(ROWS, deaths=True).replace(b"1/24/20", b"1/25/20", 1)
+    with pytest.raises(ValueError):
+        build_us(fetch_results({'confirmed': _csv(ROWS, deaths=False), 'deaths': deaths}))
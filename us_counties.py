@@ -0,0 +1,123 @@
+"""JHU US county-level time series, parsed in bounded memory.
+
+The US files have one row per county (about 3,300) and one column per day,
+after UID/FIPS/Admin2/... identifier columns; the deaths file also carries
+Population. Rows are parsed CHUNK_ROWS at a time straight into one
+preallocated int32 array, so the decoded text, the full wide frame and a
+melted long frame never exist at once. The county, state and national
+rollups are all built from that one array.
+"""
+import io
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cube import DATE_FORMAT, SOURCE_METRICS, CovidCube, RegionCube, derive_metrics
+from instrument import span
+
+US_FILES = {
+    'confirmed': "time_series_covid19_confirmed_US.csv",
+    'deaths': "time_series_covid19_deaths_US.csv"
+}
+CHUNK_ROWS = 512
+NUMERIC_ID_COLUMNS = ('UID', 'code3', 'FIPS', 'Lat', 'Long_', 'Population')
+NATIONAL = 'US'
+
+
+@dataclass
+class USData:
+    """County, state and national cubes of one US download.
+
+    `states` carries the counties as its regions (state -> county), so the
+    province drill-down works on it unchanged. Populations are aligned with
+    the county rows and the state order.
+    """
+    counties: RegionCube
+    states: CovidCube
+    national: CovidCube
+    county_population: np.ndarray
+    state_population: np.ndarray
+
+
+def read_wide_chunks(content, chunk_rows=CHUNK_ROWS):
+    """Parse a wide CSV into (identifier frame, dates, int32 values).
+
+    The identifier columns are read in one pass of their own. The values
+    array is sized from the line count up front and filled a chunk of rows
+    at a time, so only one chunk of the day columns is ever held as a frame.
+    """
+    header = pd.read_csv(io.BytesIO(content), nrows=0).columns
+    parsed = pd.to_datetime(pd.Series(header), format=DATE_FORMAT, errors='coerce')
+    first_date = int(parsed.notna().to_numpy().argmax())
+    ids = pd.read_csv(
+        io.BytesIO(content),
+        usecols=range(first_date),
+        keep_default_na=False,
+        na_values={column: [''] for column in NUMERIC_ID_COLUMNS}
+    )
+
+    values = np.empty((max(content.count(b'\n'), 1), len(header) - first_date), dtype='int32')
+    n_rows = 0
+    reader = pd.read_csv(io.BytesIO(content), usecols=range(first_date, len(header)), dtype='float64', chunksize=chunk_rows)
+    for chunk in reader:
+        values[n_rows:n_rows + len(chunk)] = np.nan_to_num(chunk.to_numpy())
+        n_rows += len(chunk)
+    return ids, pd.DatetimeIndex(parsed[first_date:]), values[:n_rows]
+
+
+def _aligned(ids, values, other_ids, other_values):
+    """other_values reordered onto the rows of ids by UID; missing rows are zero"""
+    if np.array_equal(ids['UID'].to_numpy(), other_ids['UID'].to_numpy()):
+        return other_values
+    indexer = pd.Index(other_ids['UID']).get_indexer(ids['UID'])
+    aligned = np.zeros_like(values)
+    found = indexer >= 0
+    aligned[found] = other_values[indexer[found]]
+    return aligned
+
+
+def build_us(results, chunk_rows=CHUNK_ROWS):
+    """USData from fetched US files ({'confirmed': FetchResult, 'deaths': FetchResult})"""
+    with span('us:parse'):
+        ids, dates, confirmed = read_wide_chunks(results['confirmed'].content, chunk_rows)
+        death_ids, death_dates, deaths = read_wide_chunks(results['deaths'].content, chunk_rows)
+        if not death_dates.equals(dates):
+            raise ValueError("US confirmed and deaths files cover different dates")
+        deaths = _aligned(ids, confirmed, death_ids, deaths)
+        population = np.zeros(len(ids), dtype='int64')
+        if 'Population' in death_ids:
+            uids = pd.Index(death_ids['UID'])
+            population = (
+                death_ids['Population'].fillna(0).astype('int64').set_axis(uids).reindex(ids['UID'], fill_value=0).to_numpy()
+            )
+
+    with span('us:aggregate'):
+        # Sort by state then county so every state is one contiguous slice of rows
+        regions = pd.DataFrame({
+            'Province/State': ids['Admin2'].fillna('').astype(str),
+            'Country/Region': ids['Province_State'].astype(str),
+            'Lat': ids['Lat'],
+            'Long': ids['Long_']
+        })
+        order = regions.sort_values(['Country/Region', 'Province/State'], kind='stable').index.to_numpy()
+        regions = regions.iloc[order].reset_index(drop=True)
+        county_population = population[order]
+        planes = np.zeros((len(SOURCE_METRICS), len(regions), len(dates)), dtype='int32')
+        planes[0] = confirmed[order]
+        planes[1] = deaths[order]
+        del confirmed, deaths
+
+        state_names = regions['Country/Region'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, state_names[1:] != state_names[:-1]]) if len(state_names) else np.array([], dtype=int)
+        state_planes = np.add.reduceat(planes, starts, axis=1, dtype='int64') if len(starts) else planes[:, :0]
+        state_population = np.add.reduceat(county_population, starts) if len(starts) else county_population[:0]
+        national_planes = state_planes.sum(axis=1, keepdims=True)
+
+    with span('us:derived_metrics'):
+        county_counts, county_rates = derive_metrics(planes, chunk_rows)
+        del planes
+        counties = RegionCube(regions, dates, county_counts, county_rates)
+        states = CovidCube(state_names[starts], dates, *derive_metrics(state_planes), regions=counties)
+        national = CovidCube([NATIONAL], dates, *derive_metrics(national_planes))
+    return USData(counties, states, national, county_population, state_population)